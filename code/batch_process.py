@@ -0,0 +1,266 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import argparse
+import cv2
+import numpy as np
+from multiprocessing import Pool
+from calibration_camera import StereoCalibration
+from exception import file_create, folder_create
+from disparity_engines import ENGINES
+from stereo_vision import StereoVision
+
+#: Formats de sortie disponibles : profondeur compressée, NumPy, binaire brut, CSV, carte colorisée et bandes
+OUTPUT_FORMATS = ("dpth", "npy", "bin", "csv", "png", "labels")
+#: Nom du manifeste des paires traitées, qui permet de reprendre un traitement interrompu
+MANIFEST_NAME = "manifest.jsonl"
+
+_PAIR_PATTERN = re.compile(r'^left_?(\d+)\.(jpg|png)$')
+
+
+def find_pairs(folder):
+    """
+    Recherche les paires leftNN / rightNN (jpg ou png) d'un dossier et de ses sous-dossiers (enregistrements).
+
+    :param folder: Dossier racine
+    :return: Liste triée de tuples (identifiant de la paire, image gauche, image droite)
+    """
+    pairs = []
+    for directory, _, files in os.walk(folder):
+        names = set(files)
+        for name in files:
+            match = _PAIR_PATTERN.match(name)
+            if match is None:
+                continue
+            right = 'right' + name[len('left'):]
+            if right not in names:
+                continue
+            relative = os.path.relpath(directory, folder)
+            key = match.group(1) if relative == '.' else relative.replace(os.sep, '_') + '_' + match.group(1)
+            pairs.append((relative, int(match.group(1)), key, os.path.join(directory, name),
+                          os.path.join(directory, right)))
+    # Tri par dossier puis par numéro de paire
+    return [pair[2:] for pair in sorted(pairs)]
+
+
+class BatchProcessor:
+    def __init__(self, calibration_dir=None, engine="sgbm", focale=1300, baseline=0.06, block_size=15, P1=10 * 15,
+                 P2=64, min_disp=-16, max_disp=128, uniqueRatio=4, speckleWindowSize=None, speckleRange=4,
+                 disp12MaxDiff=0, hole_filling=None, depth_thresholds=(0.5, 1.0, 2.0, 4.0), depth_range=(0.6, 5.0)):
+        """
+        Initialise le traitement hors ligne d'une paire : rectification, disparité, profondeur et segmentation
+        en bandes de profondeur.
+
+        La disparité et la profondeur sont calculées par StereoVision (sans caméra) : moteur, paramètres par
+        défaut, remplissage des trous et colorisation sont ceux du traitement en direct, une paire enregistrée
+        donne donc le même résultat qu'en direct avec la même configuration. Les paramètres non décrits
+        ci-dessous sont ceux de StereoVision.
+
+        :param calibration_dir: Dossier des données de calibration (None pour des paires déjà rectifiées)
+        :param engine: Moteur de disparité ('bm', 'sgbm', 'sgbm_3way' ou 'hh')
+        :param focale: Focale de la caméra en pixels
+        :param baseline: Distance entre les caméras en mètres
+        :param hole_filling: Remplissage des pixels de disparité invalides : None, 'fast' ou 'guided'
+        :param depth_thresholds: Limites des bandes de profondeur en mètres
+        :param depth_range: Profondeurs (proche, lointaine) de l'échelle de couleurs en mètres
+        """
+        self.calibration = None
+        if calibration_dir is not None:
+            self.calibration = StereoCalibration()
+            self.calibration.load_data(calibration_dir)
+        # Sans calibration, StereoVision reçoit une calibration vide : les paires sont déjà rectifiées
+        self.vision = StereoVision(None, baseline=baseline, focale=focale, block_size=block_size, P1=P1, P2=P2,
+                                   min_disp=min_disp, max_disp=max_disp, uniqueRatio=uniqueRatio,
+                                   speckleWindowSize=speckleWindowSize, speckleRange=speckleRange,
+                                   disp12MaxDiff=disp12MaxDiff, hole_filling=hole_filling, engine=engine,
+                                   depth_thresholds=depth_thresholds, depth_range=depth_range,
+                                   calibration=self.calibration or StereoCalibration())
+
+    def process(self, left, right):
+        """
+        Traite une paire en niveaux de gris.
+
+        Les tableaux retournés sont ceux de StereoVision et sont réécrits à la paire suivante.
+
+        :param left: Image gauche (uint8)
+        :param right: Image droite (uint8)
+        :return: Dictionnaire (disparity en pixels, depth en mètres, color, labels)
+        """
+        vision = self.vision
+        if self.calibration is not None:
+            shape = left.shape[:2]
+            left, right = self.calibration.rectify((left, right), out=(vision.pool.get("left_rectify", shape),
+                                                                       vision.pool.get("right_rectify", shape)))
+        vision.images["left_rectify"], vision.images["right_rectify"] = left, right
+        vision.depth_map_calcul()
+        vision.depth_calcul()
+        return {"disparity": vision.disparity, "depth": vision.depth, "color": vision.disparity_color,
+                "labels": vision.depth_labels}
+
+
+_processor = None
+_job = None
+
+
+def _init_worker(options, job):
+    """Initialise un processus de la réserve : un seul BatchProcessor par processus."""
+    global _processor, _job
+    # Un seul thread OpenCV par processus : le parallélisme vient de la réserve de processus
+    cv2.setNumThreads(1)
+    _processor = BatchProcessor(**options)
+    _job = job
+
+
+def _process_pair(pair):
+    """Traite une paire et écrit ses sorties ; retourne l'entrée du manifeste ou l'erreur."""
+    key, left_name, right_name = pair
+    start = time.perf_counter()
+    try:
+        left, right = cv2.imread(left_name, 0), cv2.imread(right_name, 0)
+        if left is None or right is None:
+            raise ValueError("image illisible")
+        result = _processor.process(left, right)
+        folder = _job["output"]
+        outputs = []
+        for output_format in _job["formats"]:
+            if output_format == "png":
+                data, name, file_type = result["color"], "depthmap" + key, 'png'
+            elif output_format == "labels":
+                data, name, file_type = result["labels"], "labels" + key, 'png'
+            else:
+                data, name, file_type = result["depth"], "depth" + key, output_format
+            # Une sortie non écrite fait échouer la paire : elle sera retraitée à la reprise
+            if not file_create(data, name, file_type, folder):
+                raise OSError(f"écriture impossible de {name}.{file_type}")
+            outputs.append(name + "." + file_type)
+        valid_ratio = float(np.count_nonzero(result["depth"])) / result["depth"].size
+        return {"pair": key, "config": _job["config"], "outputs": outputs, "valid_ratio": round(valid_ratio, 4),
+                "seconds": round(time.perf_counter() - start, 4)}
+    except Exception as e:
+        return {"pair": key, "error": str(e)}
+
+
+def config_hash(options, formats):
+    """
+    Calcule l'empreinte des paramètres de traitement (une paire n'est reprise que si elle a été traitée avec
+    les mêmes paramètres).
+
+    :return: Empreinte hexadécimale courte
+    """
+    text = json.dumps({"options": options, "formats": sorted(formats)}, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:12]
+
+
+def load_manifest(folder, config):
+    """
+    Lit le manifeste d'un dossier de sortie.
+
+    :param folder: Dossier de sortie
+    :param config: Empreinte des paramètres courants
+    :return: Ensemble des identifiants des paires déjà traitées avec ces paramètres
+    """
+    done = set()
+    name = os.path.join(folder, MANIFEST_NAME)
+    if not os.path.isfile(name):
+        return done
+    with open(name) as manifest:
+        for line in manifest:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Dernière ligne tronquée par une interruption
+            if entry.get("config") == config and "error" not in entry:
+                done.add(entry["pair"])
+    return done
+
+
+def run_batch(input_folder, output_folder, options, formats=("dpth",), processes=None, chunksize=None, resume=True):
+    """
+    Traite toutes les paires d'un dossier avec une réserve de processus.
+
+    Chaque paire terminée est ajoutée au manifeste du dossier de sortie dès sa fin : après une interruption,
+    un nouvel appel ne traite que les paires restantes.
+
+    :param input_folder: Dossier (ou enregistrement) contenant les paires leftNN / rightNN
+    :param output_folder: Dossier des résultats
+    :param options: Paramètres de BatchProcessor
+    :param formats: Formats de sortie (voir OUTPUT_FORMATS)
+    :param processes: Nombre de processus (par défaut le nombre de cœurs)
+    :param chunksize: Nombre de paires distribuées à la fois à un processus (par défaut calculé)
+    :param resume: Si False, retraite aussi les paires déjà présentes dans le manifeste
+    :return: Dictionnaire (paires traitées, ignorées, en erreur, durée, paires par seconde)
+    """
+    folder_create(output_folder)
+    config = config_hash(options, formats)
+    pairs = find_pairs(input_folder)
+    done = load_manifest(output_folder, config) if resume else set()
+    todo = [pair for pair in pairs if pair[0] not in done]
+    print(f"{len(pairs)} paires trouvées, {len(pairs) - len(todo)} déjà traitées, {len(todo)} à traiter")
+    summary = {"processed": 0, "skipped": len(pairs) - len(todo), "errors": 0, "seconds": 0.0, "pairs_per_s": 0.0}
+    if not todo:
+        return summary
+
+    processes = processes or os.cpu_count() or 1
+    if chunksize is None:
+        # Quelques lots par processus : peu d'échanges entre processus tout en équilibrant la charge en fin de lot
+        chunksize = max(1, len(todo) // (processes * 4))
+    job = {"output": output_folder, "formats": list(formats), "config": config}
+
+    start = time.perf_counter()
+    with open(os.path.join(output_folder, MANIFEST_NAME), 'a') as manifest, \
+            Pool(processes, initializer=_init_worker, initargs=(options, job)) as pool:
+        for entry in pool.imap_unordered(_process_pair, todo, chunksize=chunksize):
+            if "error" in entry:
+                summary["errors"] += 1
+                print(f"Erreur sur la paire {entry['pair']} : {entry['error']}")
+            else:
+                summary["processed"] += 1
+            manifest.write(json.dumps(entry) + '\n')
+            manifest.flush()
+            count = summary["processed"] + summary["errors"]
+            if count % max(1, len(todo) // 10) == 0 or count == len(todo):
+                elapsed = time.perf_counter() - start
+                print(f"{count}/{len(todo)} paires ({count / elapsed:.2f} paires/s)")
+    summary["seconds"] = time.perf_counter() - start
+    summary["pairs_per_s"] = summary["processed"] / summary["seconds"]
+    print(f"{summary['processed']} paires traitées en {summary['seconds']:.1f} s "
+          f"({summary['pairs_per_s']:.2f} paires/s, {processes} processus, lots de {chunksize})")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Traitement hors ligne de paires stéréo enregistrées")
+    parser.add_argument("input", help="Dossier (ou enregistrement) de paires leftNN / rightNN")
+    parser.add_argument("output", help="Dossier des résultats")
+    parser.add_argument("--calibration", default="data",
+                        help="Dossier des données de calibration ('none' pour des paires déjà rectifiées)")
+    parser.add_argument("--config", help="Fichier JSON de paramètres exporté par sgbm_tuner")
+    parser.add_argument("--engine", choices=list(ENGINES), default=None, help="Moteur de disparité")
+    parser.add_argument("--hole-filling", choices=["fast", "guided"], help="Remplissage des trous de disparité")
+    parser.add_argument("--focale", type=float, default=1300, help="Focale en pixels")
+    parser.add_argument("--baseline", type=float, default=0.06, help="Distance entre les caméras en mètres")
+    parser.add_argument("--formats", nargs="+", choices=OUTPUT_FORMATS, default=["dpth"],
+                        help="Formats de sortie ('png' : carte colorisée, 'labels' : bandes de profondeur)")
+    parser.add_argument("--processes", type=int, help="Nombre de processus (par défaut le nombre de cœurs)")
+    parser.add_argument("--chunksize", type=int, help="Nombre de paires distribuées à la fois à un processus")
+    parser.add_argument("--no-resume", action="store_true", help="Retraite aussi les paires déjà traitées")
+    args = parser.parse_args()
+
+    options = {"calibration_dir": None if args.calibration == "none" else args.calibration,
+               "focale": args.focale, "baseline": args.baseline, "hole_filling": args.hole_filling}
+    if args.config:
+        with open(args.config) as f:
+            parameters = json.load(f)
+        for key in ("engine", "block_size", "P1", "P2", "min_disp", "max_disp", "uniqueRatio",
+                    "speckleWindowSize", "speckleRange", "disp12MaxDiff"):
+            if key in parameters:
+                options[key] = parameters[key]
+    if args.engine:
+        options["engine"] = args.engine
+
+    summary = run_batch(args.input, args.output, options, formats=args.formats, processes=args.processes,
+                        chunksize=args.chunksize, resume=not args.no_resume)
+    sys.exit(1 if summary["errors"] else 0)
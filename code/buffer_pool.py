@@ -0,0 +1,54 @@
+import numpy as np
+
+
+class BufferPool:
+    def __init__(self):
+        """
+        Initialise la réserve de tableaux réutilisés d'une image à l'autre.
+
+        Chaque tampon est identifié par un nom et n'est alloué qu'au premier appel (ou si sa forme ou son type
+        change, par exemple après un changement de résolution de traitement) : une fois la première image
+        traitée, la boucle de traitement n'alloue plus de nouveaux tableaux. Les tampons sont réécrits à chaque
+        image, les données à conserver doivent donc être copiées.
+        """
+        self.buffers = {}
+        self.allocations = 0  # Nombre total d'allocations, pour vérifier l'absence d'allocation en régime établi
+
+    def get(self, name, shape, dtype=np.uint8):
+        """
+        Retourne le tampon demandé, en ne l'allouant que s'il n'existe pas encore avec cette forme et ce type.
+
+        :param name: Nom du tampon
+        :param shape: Forme du tableau
+        :param dtype: Type des éléments
+        :return: Tableau NumPy (contenu non initialisé à la première allocation)
+        """
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype)
+            self.buffers[name] = buffer
+            self.allocations += 1
+        return buffer
+
+    def reserve(self, specs):
+        """
+        Alloue à l'avance un ensemble de tampons (au démarrage, quand les tailles sont connues).
+
+        :param specs: Dictionnaire {nom: (forme, type)}
+        """
+        for name, (shape, dtype) in specs.items():
+            self.get(name, shape, dtype)
+
+    def nbytes(self):
+        """
+        Retourne la mémoire occupée par les tampons.
+
+        :return: Taille totale en octets
+        """
+        return sum(buffer.nbytes for buffer in self.buffers.values())
+
+    def clear(self):
+        """
+        Libère tous les tampons.
+        """
+        self.buffers.clear()
@@ -1,20 +1,33 @@
 import os
+import hashlib
+from collections import OrderedDict
 import cv2
 import numpy as np
+from multiprocessing import Pool
 from exception import file_create
+from file_writer import get_writer
 
 
 class StereoCalibration:
     def __str__(self):
         """Retourne une représentation en chaîne de caractères des attributs de la classe."""
         output = ""
-        for key, item in self.__dict__.items():
+        for key, item in self._parameters():
             output += key + ":\n"
             output += str(item) + "\n"
         return output
 
-    def __init__(self):
-        """Initialise la classe StereoCalibration avec des paramètres par défaut."""
+    def __init__(self, max_cached_maps=4, map_cache_dir=None):
+        """
+        Initialise la classe StereoCalibration avec des paramètres par défaut.
+
+        Seuls les paramètres intrinsèques et extrinsèques sont conservés et enregistrés. Les cartes de
+        remappage sont construites à la demande pour chaque résolution d'image (voir rectification_maps).
+
+        :param max_cached_maps: Nombre maximal de résolutions dont les cartes sont gardées en mémoire
+        :param map_cache_dir: Dossier où enregistrer les cartes construites pour les réutiliser au lancement
+                              suivant (facultatif)
+        """
         #: Matrices des caméras (paramètres intrinsèques)
         self.cam_mats = {"left": None, "right": None}
         #: Coefficients de distorsion (D)
@@ -35,45 +48,152 @@ class StereoCalibration:
         self.disp_to_depth_mat = None
         #: Boîtes de délimitation des pixels valides
         self.valid_boxes = {"left": None, "right": None}
-        #: Cartes d'undistortion pour la remappage
-        self.undistortion_map = {"left": None, "right": None}
-        #: Cartes de rectification pour la remappage
-        self.rectification_map = {"left": None, "right": None}
+        #: Taille (largeur, hauteur) des images de calibration, à laquelle se rapportent les paramètres
+        self.image_size = None
+        # Cartes de remappage par résolution, de la moins récemment utilisée à la plus récente
+        self._maps = OrderedDict()
+        self._max_cached_maps = max_cached_maps
+        self._map_cache_dir = map_cache_dir
+
+    def _parameters(self):
+        """Retourne les paramètres de calibration (attributs publics), sans le cache des cartes."""
+        return [(key, item) for key, item in self.__dict__.items() if not key.startswith('_')]
 
-    def save_data(self):
-        """Enregistre les données de calibration dans des fichiers .npy et .csv."""
+    def save_data(self, directory='data'):
+        """
+        Enregistre les données de calibration dans des fichiers .npy et .csv.
+
+        :param directory: Dossier de destination
+        """
         try:
-            for key, item in self.__dict__.items():
+            for key, item in self._parameters():
                 if isinstance(item, dict):
                     # Enregistre les données pour chaque côté (left, right) si c'est un dictionnaire
                     for side in ("left", "right"):
                         filename = f"{key}_{side}"
-                        file_create(self.__dict__[key][side], filename, 'npy', 'data')
-                        file_create(self.__dict__[key][side], filename, 'csv', 'data')
-                else:
+                        file_create(np.asarray(item[side]), filename, 'npy', directory)
+                        file_create(np.asarray(item[side]), filename, 'csv', directory)
+                elif item is not None:
                     # Enregistre les données pour les attributs non-dictionnaires
-                    file_create(self.__dict__[key], key, 'npy', 'data')
-                    file_create(self.__dict__[key], key, 'csv', 'data')
+                    file_create(np.asarray(item), key, 'npy', directory)
+                    file_create(np.asarray(item), key, 'csv', directory)
 
         except Exception as e:
-            print(f"Erreur lors de l'enregistrement des données dans 'data': {e}")
+            print(f"Erreur lors de l'enregistrement des données dans '{directory}': {e}")
+
+    def _fingerprint(self):
+        """Empreinte des paramètres dont dépendent les cartes (pour invalider les cartes enregistrées)."""
+        digest = hashlib.sha1()
+        for item in (self.cam_mats["left"], self.cam_mats["right"], self.dist_coefs["left"],
+                     self.dist_coefs["right"], self.rot_mat, self.trans_vec, self.image_size):
+            digest.update(np.ascontiguousarray(item, np.float64).tobytes())
+        return digest.hexdigest()
+
+    def _build_maps(self, size):
+        """
+        Construit les cartes de remappage (gauche, droite) pour une taille d'image donnée.
+
+        Les cartes sont arrondies au pixel le plus proche et stockées en entiers 16 bits (CV_16SC2) : le résultat
+        de l'interpolation au plus proche voisin est identique à celui des cartes flottantes, pour deux fois
+        moins de mémoire.
+
+        Les paramètres intrinsèques sont mis à l'échelle de la résolution demandée, en supposant que le capteur
+        couvre le même champ qu'à la calibration ; la rectification est recalculée à cette résolution.
+        """
+        width, height = size
+        calib_width, calib_height = self.image_size
+        if (width, height) == (calib_width, calib_height):
+            rect_trans, proj_mats = self.rect_trans, self.proj_mats
+            cam_mats = self.cam_mats
+        else:
+            scale_x, scale_y = width / calib_width, height / calib_height
+            cam_mats = {}
+            for side in ("left", "right"):
+                cam_mat = np.array(self.cam_mats[side], np.float64)
+                cam_mat[0, 0] *= scale_x
+                cam_mat[1, 1] *= scale_y
+                # Centre optique : mise à l'échelle des coordonnées de centre de pixel
+                cam_mat[0, 2] = (cam_mat[0, 2] + 0.5) * scale_x - 0.5
+                cam_mat[1, 2] = (cam_mat[1, 2] + 0.5) * scale_y - 0.5
+                cam_mats[side] = cam_mat
+            rect_trans, proj_mats = {}, {}
+            (rect_trans["left"], rect_trans["right"],
+             proj_mats["left"], proj_mats["right"]) = cv2.stereoRectify(cam_mats["left"], self.dist_coefs["left"],
+                                                                        cam_mats["right"], self.dist_coefs["right"],
+                                                                        (width, height), self.rot_mat, self.trans_vec,
+                                                                        flags=0)[:4]
+        maps = []
+        for side in ("left", "right"):
+            map_x, map_y = cv2.initUndistortRectifyMap(cam_mats[side], self.dist_coefs[side], rect_trans[side],
+                                                       proj_mats[side], (width, height), cv2.CV_32FC1)
+            maps.append(cv2.convertMaps(map_x, map_y, cv2.CV_16SC2, nninterpolation=True)[0])
+        return tuple(maps)
 
-    def rectify(self, frames):
-        """Rectifie les images stéréo en utilisant les cartes de rectification et d'undistortion."""
+    def rectification_maps(self, size):
+        """
+        Retourne les cartes de remappage pour une taille d'image, en les construisant au premier appel.
+
+        Les cartes sont gardées en mémoire pour les max_cached_maps dernières résolutions utilisées et, si un
+        dossier de cache est défini, enregistrées puis relues aux lancements suivants.
+
+        :param size: Taille (largeur, hauteur) des images à rectifier
+        :return: Tuple (carte gauche, carte droite), cartes CV_16SC2 de forme (hauteur, largeur, 2)
+        """
+        size = (int(size[0]), int(size[1]))
+        maps = self._maps.get(size)
+        if maps is not None:
+            self._maps.move_to_end(size)
+            return maps
+        if self.image_size is None or self.cam_mats["left"] is None:
+            raise ValueError("Calibration non chargée : impossible de construire les cartes de rectification")
+
+        file_name = None
+        if self._map_cache_dir is not None:
+            file_name = os.path.join(self._map_cache_dir, f"rectify_{size[0]}x{size[1]}.npz")
+            fingerprint = self._fingerprint()
+            if os.path.isfile(file_name):
+                with np.load(file_name) as data:
+                    if str(data["fingerprint"]) == fingerprint:
+                        maps = (data["left"], data["right"])
+        if maps is None:
+            maps = self._build_maps(size)
+            if file_name is not None:
+                try:
+                    os.makedirs(self._map_cache_dir, exist_ok=True)
+                    np.savez(file_name, fingerprint=fingerprint, left=maps[0], right=maps[1])
+                except OSError as e:
+                    print(f"Erreur lors de l'enregistrement des cartes de rectification '{file_name}': {e}")
+
+        self._maps[size] = maps
+        while len(self._maps) > self._max_cached_maps:
+            self._maps.popitem(last=False)  # Résolution la moins récemment utilisée
+        return maps
+
+    def rectify(self, frames, out=None):
+        """
+        Rectifie les images stéréo avec les cartes de remappage correspondant à leur résolution.
+
+        :param frames: Images (gauche, droite)
+        :param out: Tableaux (gauche, droite) de sortie à réutiliser (facultatif)
+        :return: Images rectifiées (gauche, droite)
+        """
+        height, width = frames[0].shape[:2]
+        maps = self.rectification_maps((width, height))
         new_frames = []
-        for i, side in enumerate(("left", "right")):
+        for i in range(2):
             # Applique le remappage pour corriger les distorsions et rectifier les images
             new_frames.append(cv2.remap(frames[i],
-                                        self.undistortion_map[side],
-                                        self.rectification_map[side],
-                                        cv2.INTER_NEAREST))
+                                        maps[i],
+                                        None,
+                                        cv2.INTER_NEAREST,
+                                        dst=None if out is None else out[i]))
         return new_frames
 
     def load_data(self, directory):
         """Charge les paramètres de calibration à partir de fichiers .npy dans le répertoire spécifié."""
         try:
-            for key in self.__dict__.keys():
-                if isinstance(self.__dict__[key], dict):
+            for key, item in self._parameters():
+                if isinstance(item, dict):
                     for side in ("left", "right"):
                         filename = f"{directory}/{key}_{side}.npy"
                         if os.path.exists(filename):
@@ -88,6 +208,12 @@ class StereoCalibration:
                         self.__dict__[key] = np.load(filename)
                     else:
                         print(f"Fichier {filename} non trouvé.")
+            if self.image_size is None and os.path.exists(f"{directory}/undistortion_map_left.npy"):
+                # Ancienne calibration sans taille d'image : taille déduite des cartes enregistrées
+                self.image_size = np.load(f"{directory}/undistortion_map_left.npy", mmap_mode='r').shape[1::-1]
+            if self.image_size is not None:
+                self.image_size = (int(self.image_size[0]), int(self.image_size[1]))
+            self._maps.clear()
             print("Chargement des données terminé avec succès.")
         except Exception as e:
             print(f"Erreur lors du chargement des données: {e}")
@@ -117,55 +243,174 @@ class Calibrator:
         self.object_points = []
         #: Liste des coordonnées des coins trouvées dans les images de calibration pour les caméras gauche et droite
         self.image_points = {"left": [], "right": []}
+        #: Taille de la grille utilisée pour mesurer la couverture de l'image par les vues
+        self.coverage_grid = (16, 12)
+        #: Nombre minimal de vues à conserver lors du rejet des vues aberrantes
+        self.min_views = 6
+        #: Erreur RMS de la dernière calibration
+        self.rms = None
+        #: Indices des vues utilisées par la dernière calibration
+        self.views = []
+        #: Erreur de reprojection de chaque vue utilisée
+        self.view_errors = None
 
-    def corner_detect(self, image_pair):
-        """Détecte et affine les coins du tableau d'échecs dans une paire d'images."""
-        side = "left"
+    def add_view(self, corners_left, corners_right):
+        """
+        Ajoute une vue (paire de coins détectés) aux données de calibration.
+
+        :param corners_left: Coins détectés dans l'image gauche (ou None)
+        :param corners_right: Coins détectés dans l'image droite (ou None)
+        :return: True si la vue a été ajoutée, False si la paire est rejetée
+        """
+        if corners_left is None or corners_right is None:
+            # La paire n'est utilisable que si l'échiquier est trouvé des deux côtés
+            return False
         self.object_points.append(self.corner_coordinates)
+        self.image_points["left"].append(corners_left.reshape(-1, 2))
+        self.image_points["right"].append(corners_right.reshape(-1, 2))
+        self.image_count += 1
+        return True
 
-        for image in image_pair:
+    def corner_detect(self, image_pair):
+        """Détecte et affine les coins du tableau d'échecs dans une paire d'images."""
+        pattern_size = (self.row, self.column)
+        found = []
+        for side, image in zip(("left", "right"), image_pair):
             img = np.copy(image)
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            ret, corners = cv2.findChessboardCorners(gray, (self.row, self.column))
-            if ret:
-                # Dessine les coins détectés sur l'image
-                cv2.drawChessboardCorners(img, (self.column, self.row), corners, ret)
-                cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1),
-                                 (cv2.TERM_CRITERIA_MAX_ITER + cv2.TERM_CRITERIA_EPS, 30, 0.01))
-                # Sauvegarde l'image avec les coins détectés
+            corners = find_corners(gray, pattern_size)
+            if corners is not None:
+                # Dessine et sauvegarde l'image avec les coins détectés
+                cv2.drawChessboardCorners(img, pattern_size, corners, True)
                 name = "corner/" + side + str(self.image_count + 1).zfill(2) + "corn"
-                file_create(img, name, 'png')
+                get_writer().submit(img, name, 'png')
+            found.append(corners)
 
-            # Ajoute les coins détectés à la liste des points d'image
-            self.image_points[side].append(corners.reshape(-1, 2))
-            side = "right"
-        self.image_count += 1
+        if not self.add_view(*found):
+            print("Échiquier non détecté sur la paire, elle est ignorée")
+
+    def view_features(self, index):
+        """
+        Calcule les descripteurs d'une vue utilisés pour la sélection des vues.
+
+        :param index: Indice de la vue
+        :return: Tuple (cellules couvertes de la grille de l'image, descripteur de pose)
+        """
+        width, height = self.image_size
+        cells = np.zeros((self.coverage_grid[1], self.coverage_grid[0]), np.uint8)
+        scale = np.array([self.coverage_grid[0] / width, self.coverage_grid[1] / height], np.float32)
+        for side in ("left", "right"):
+            points = self.image_points[side][index]
+            # Enveloppe convexe de l'échiquier projetée sur la grille de couverture
+            hull = cv2.convexHull((points * scale).astype(np.int32))
+            cv2.fillConvexPoly(cells, hull, 1)
+
+        # Pose approchée à partir des quatre coins extérieurs de l'échiquier (image gauche)
+        grid = self.image_points["left"][index].reshape(self.column, self.row, 2)
+        c00, c01, c10, c11 = grid[0, 0], grid[0, -1], grid[-1, 0], grid[-1, -1]
+        center = grid.reshape(-1, 2).mean(axis=0) / np.array([width, height], np.float32)
+        area = cv2.contourArea(np.array([c00, c01, c11, c10], np.float32))
+        size = np.sqrt(area / (width * height))
+        edge = c01 - c00
+        angle = np.arctan2(edge[1], edge[0])
+        # Rapports des côtés opposés : indiquent l'inclinaison du plan de l'échiquier
+        tilt_x = np.log(np.linalg.norm(c10 - c00) / max(np.linalg.norm(c11 - c01), 1e-6))
+        tilt_y = np.log(np.linalg.norm(c01 - c00) / max(np.linalg.norm(c11 - c10), 1e-6))
+        pose = np.array([center[0], center[1], size, np.cos(angle), np.sin(angle), tilt_x, tilt_y], np.float32)
+        return cells.astype(bool).ravel(), pose
+
+    def select_views(self, max_views):
+        """
+        Sélectionne un sous-ensemble borné de vues couvrant l'image avec des poses variées.
+
+        La sélection est gloutonne : la vue couvrant le plus de cellules est prise en premier, puis on ajoute
+        à chaque étape la vue qui apporte le plus de nouvelles cellules couvertes et qui est la plus éloignée
+        (en pose) des vues déjà retenues.
+
+        :param max_views: Nombre maximal de vues à retenir
+        :return: Liste triée des indices des vues retenues
+        """
+        count = len(self.object_points)
+        if count <= max_views:
+            return list(range(count))
+
+        features = [self.view_features(i) for i in range(count)]
+        cells = np.array([f[0] for f in features])
+        poses = np.array([f[1] for f in features])
+        # Normalisation des descripteurs de pose pour que chaque composante ait le même poids
+        poses = (poses - poses.mean(axis=0)) / (poses.std(axis=0) + 1e-6)
+
+        selected = [int(np.argmax(cells.sum(axis=1)))]
+        covered = cells[selected[0]].copy()
+        min_dist = np.linalg.norm(poses - poses[selected[0]], axis=1)
+        while len(selected) < max_views:
+            gain = (cells & ~covered).sum(axis=1) / cells.shape[1]
+            score = gain + min_dist / (min_dist.max() + 1e-6)
+            score[selected] = -np.inf
+            best = int(np.argmax(score))
+            selected.append(best)
+            covered |= cells[best]
+            min_dist = np.minimum(min_dist, np.linalg.norm(poses - poses[best], axis=1))
+        return sorted(selected)
+
+    def stereo_calibrate(self, calib, views, criteria, flags):
+        """
+        Effectue la calibration stéréo sur les vues données.
+
+        :param calib: Instance de StereoCalibration à remplir
+        :param views: Indices des vues à utiliser
+        :param criteria: Critère d'arrêt de l'optimisation
+        :param flags: Options de calibration d'OpenCV
+        :return: Tuple (erreur RMS, erreur de reprojection par vue)
+        """
+        result = cv2.stereoCalibrateExtended([self.object_points[i] for i in views],
+                                             [self.image_points["left"][i] for i in views],
+                                             [self.image_points["right"][i] for i in views],
+                                             None, None, None, None,
+                                             self.image_size, None, None,
+                                             criteria=criteria, flags=flags)
+        (calib.cam_mats["left"], calib.dist_coefs["left"],
+         calib.cam_mats["right"], calib.dist_coefs["right"],
+         calib.rot_mat, calib.trans_vec, calib.e_mat, calib.f_mat) = result[1:9]
+        # Erreur par vue : moyenne des erreurs des caméras gauche et droite
+        return result[0], np.asarray(result[-1]).reshape(len(views), -1).mean(axis=1)
+
+    def calibrate_camera(self, max_views=20, outlier_factor=2.5, max_iter=100):
+        """
+        Calibre les caméras stéréo et calcule les matrices de calibration.
+
+        Un sous-ensemble borné de vues est d'abord sélectionné, ce qui borne le temps de calcul. Après une
+        première résolution, les vues dont l'erreur de reprojection dépasse outlier_factor fois l'erreur
+        médiane sont écartées et la calibration est relancée.
 
-    def calibrate_camera(self):
-        """Calibre les caméras stéréo et calcule les matrices de calibration."""
+        :param max_views: Nombre maximal de vues utilisées pour la calibration
+        :param outlier_factor: Facteur appliqué à l'erreur médiane pour rejeter une vue (None pour désactiver)
+        :param max_iter: Nombre maximal d'itérations de l'optimisation
+        """
         criteria = (cv2.TERM_CRITERIA_MAX_ITER + cv2.TERM_CRITERIA_EPS,
-                    100, 1e-5)
+                    max_iter, 1e-5)
         flags = (cv2.CALIB_FIX_ASPECT_RATIO + cv2.CALIB_ZERO_TANGENT_DIST +
                  cv2.CALIB_SAME_FOCAL_LENGTH)
         calib = StereoCalibration()
 
-        # Effectue la calibration stéréo
-        (calib.cam_mats["left"], calib.dist_coefs["left"],
-         calib.cam_mats["right"], calib.dist_coefs["right"],
-         calib.rot_mat, calib.trans_vec, calib.e_mat, calib.f_mat) = cv2.stereoCalibrate(self.object_points,
-                                                                                         self.image_points["left"],
-                                                                                         self.image_points["right"],
-                                                                                         calib.cam_mats["left"],
-                                                                                         calib.dist_coefs["left"],
-                                                                                         calib.cam_mats["right"],
-                                                                                         calib.dist_coefs["right"],
-                                                                                         self.image_size,
-                                                                                         calib.rot_mat,
-                                                                                         calib.trans_vec,
-                                                                                         calib.e_mat,
-                                                                                         calib.f_mat,
-                                                                                         criteria=criteria,
-                                                                                         flags=flags)[1:]
+        # Sélection des vues puis calibration stéréo
+        views = self.select_views(max_views)
+        print(f"{len(views)} vues retenues sur {len(self.object_points)}")
+        self.rms, errors = self.stereo_calibrate(calib, views, criteria, flags)
+        print(f"Erreur RMS : {self.rms:.4f}")
+
+        if outlier_factor is not None:
+            # Rejet des vues aberrantes et nouvelle résolution
+            inliers = errors <= outlier_factor * np.median(errors)
+            if not inliers.all() and inliers.sum() >= self.min_views:
+                rejected = [views[i] for i in np.flatnonzero(~inliers)]
+                print(f"Vues rejetées (erreur trop élevée) : {rejected}")
+                views = [views[i] for i in np.flatnonzero(inliers)]
+                self.rms, errors = self.stereo_calibrate(calib, views, criteria, flags)
+                print(f"Erreur RMS après rejet : {self.rms:.4f}")
+        #: Indices des vues utilisées et erreur de reprojection de chacune
+        self.views = views
+        self.view_errors = errors
         print("Étape 1 terminée")
         # Calcule les transformations de rectification pour les images
         (calib.rect_trans["left"], calib.rect_trans["right"],
@@ -179,39 +424,70 @@ class Calibrator:
                                                          calib.rot_mat,
                                                          calib.trans_vec,
                                                          flags=0)
+        # Les cartes de remappage sont construites à la demande, pour chaque résolution utilisée
+        calib.image_size = tuple(self.image_size)
         print("Étape 2 terminée")
-        # Calcule les éléments pour la rectification des images (partie map)
-        for side in ("left", "right"):
-            (calib.undistortion_map[side],
-             calib.rectification_map[side]) = cv2.initUndistortRectifyMap(
-                calib.cam_mats[side],
-                calib.dist_coefs[side],
-                calib.rect_trans[side],
-                calib.proj_mats[side],
-                self.image_size,
-                cv2.CV_32FC1)
-        print("Étape 3 terminée")
         return calib
 
-    def calibration_process(self, nbr_photo, image_folder):
-        """Effectue le processus de calibration en utilisant un nombre donné de photos dans le dossier spécifié."""
-        photo_counter = 0
+    def calibration_process(self, nbr_photo, image_folder, processes=None, detect_scale=0.5,
+                            cache_dir='corner/cache'):
+        """
+        Effectue le processus de calibration en utilisant un nombre donné de photos dans le dossier spécifié.
+
+        La détection des coins est répartie sur un pool de processus : chaque image est d'abord analysée
+        en résolution réduite, puis les coins sont affinés en pleine résolution.
+
+        :param nbr_photo: Nombre de paires d'images à utiliser
+        :param image_folder: Dossier contenant les images leftNN.jpg / rightNN.jpg
+        :param processes: Nombre de processus de détection (par défaut le nombre de cœurs)
+        :param detect_scale: Facteur de réduction pour la recherche grossière (1 pour la désactiver)
+        :param cache_dir: Dossier du cache des coins détectés (None pour le désactiver)
+        """
         print('Début de la calibration')
         print('Début de la lecture des images')
 
-        # Boucle pour lire un nombre spécifié de paires d'images
-        while photo_counter != nbr_photo:
-            photo_counter += 1
-            print('Importation de la paire No ' + str(photo_counter))
+        # Liste des paires disponibles
+        pairs = []
+        for photo_counter in range(1, nbr_photo + 1):
             left_name = image_folder + '/left' + str(photo_counter).zfill(2) + '.jpg'
             right_name = image_folder + '/right' + str(photo_counter).zfill(2) + '.jpg'
-
             if os.path.isfile(left_name) and os.path.isfile(right_name):
-                # Charge les images gauche et droite
-                img_left = cv2.imread(left_name, 1)
-                img_right = cv2.imread(right_name, 1)
-                # Détecte les coins du tableau d'échecs dans les images
-                self.corner_detect((img_left, img_right))
+                pairs.append((photo_counter, left_name, right_name))
+            else:
+                print('Paire No ' + str(photo_counter) + ' introuvable')
+
+        # Les images déjà traitées sont lues dans le cache, seules les nouvelles sont analysées
+        pattern_size = (self.row, self.column)
+        cache = CornerCache(cache_dir, pattern_size) if cache_dir else None
+        results = []
+        keys = []
+        tasks = []
+        for photo_counter, left_name, right_name in pairs:
+            for side, name in (("left", left_name), ("right", right_name)):
+                key = cache.key(name) if cache else None
+                if cache and cache.contains(key):
+                    results.append(cache.get(key))
+                else:
+                    # Une tâche par image, afin d'équilibrer la charge entre les processus
+                    corner_name = "corner/" + side + str(photo_counter).zfill(2) + "corn"
+                    tasks.append((len(results), (name, pattern_size, detect_scale, corner_name)))
+                    results.append(None)
+                keys.append(key)
+        print(f'{len(results) - len(tasks)} images lues dans le cache, {len(tasks)} à analyser')
+
+        if tasks:
+            with Pool(processes) as pool:
+                detected = pool.map(detect_image_corners, [task for _, task in tasks], chunksize=1)
+            for (index, _), corners in zip(tasks, detected):
+                results[index] = corners
+                if cache:
+                    cache.put(keys[index], corners)
+
+        for i, (photo_counter, _, _) in enumerate(pairs):
+            print('Importation de la paire No ' + str(photo_counter))
+            if not self.add_view(results[2 * i], results[2 * i + 1]):
+                print('Échiquier non détecté sur la paire No ' + str(photo_counter) + ', elle est ignorée')
+        print(f'{self.image_count} paires retenues sur {len(pairs)}')
 
         print('Fin du cycle')
         print('Début de la calibration... Cela peut prendre plusieurs minutes !')
@@ -225,3 +501,115 @@ class Calibrator:
         print('Fin de la sauvegarde des données')
 
         return calib
+
+
+class CornerCache:
+    def __init__(self, directory, pattern_size):
+        """
+        Initialise le cache des coins détectés.
+
+        Chaque entrée est un fichier .npy dont le nom combine l'empreinte SHA-1 du contenu de l'image et la
+        taille du motif : une image modifiée ou un autre échiquier donnent une nouvelle entrée. Les échecs de
+        détection sont aussi mémorisés (tableau vide) pour ne pas relancer la recherche.
+
+        :param directory: Dossier où sont stockées les entrées du cache
+        :param pattern_size: Nombre de coins internes (rangées, colonnes)
+        """
+        self.directory = directory
+        self.pattern_size = pattern_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, filename):
+        """
+        Calcule la clé du cache pour une image.
+
+        :param filename: Chemin de l'image
+        :return: Clé combinant l'empreinte du fichier et la taille du motif
+        """
+        sha1 = hashlib.sha1()
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha1.update(block)
+        return f"{sha1.hexdigest()}_{self.pattern_size[0]}x{self.pattern_size[1]}"
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def contains(self, key):
+        """Indique si la clé est présente dans le cache."""
+        return os.path.isfile(self._path(key))
+
+    def get(self, key):
+        """
+        Lit les coins mémorisés pour une clé.
+
+        :param key: Clé du cache
+        :return: Coins détectés ou None si l'échiquier n'avait pas été trouvé
+        """
+        corners = np.load(self._path(key))
+        return corners if corners.size else None
+
+    def put(self, key, corners):
+        """
+        Mémorise les coins détectés pour une clé.
+
+        :param key: Clé du cache
+        :param corners: Coins détectés ou None en cas d'échec
+        """
+        if corners is None:
+            corners = np.empty((0, 1, 2), np.float32)
+        np.save(self._path(key), corners)
+
+
+def find_corners(gray, pattern_size, scale=0.5):
+    """
+    Détecte les coins du tableau d'échecs dans une image en niveaux de gris.
+
+    La recherche est faite sur une image réduite, ce qui est beaucoup plus rapide, puis les coins sont
+    replacés à l'échelle d'origine et affinés au sous-pixel en pleine résolution. Si la recherche réduite
+    échoue, une recherche en pleine résolution est tentée.
+
+    :param gray: Image en niveaux de gris
+    :param pattern_size: Nombre de coins internes (rangées, colonnes)
+    :param scale: Facteur de réduction pour la recherche grossière
+    :return: Coins détectés (N x 1 x 2, float32) ou None si l'échiquier n'est pas trouvé
+    """
+    ret, corners = False, None
+    if 0 < scale < 1:
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        ret, corners = cv2.findChessboardCorners(small, pattern_size,
+                                                 flags=cv2.CALIB_CB_ADAPTIVE_THRESH +
+                                                 cv2.CALIB_CB_NORMALIZE_IMAGE + cv2.CALIB_CB_FAST_CHECK)
+        if ret:
+            # Remise à l'échelle des coins trouvés sur l'image réduite
+            corners = (corners / scale).astype(np.float32)
+    if not ret:
+        ret, corners = cv2.findChessboardCorners(gray, pattern_size)
+    if not ret:
+        return None
+
+    cv2.cornerSubPix(gray, corners, (11, 11), (-1, -1),
+                     (cv2.TERM_CRITERIA_MAX_ITER + cv2.TERM_CRITERIA_EPS, 30, 0.01))
+    return corners
+
+
+def detect_image_corners(task):
+    """
+    Lit une image de calibration et détecte ses coins (fonction exécutée dans le pool de processus).
+
+    :param task: Tuple (chemin de l'image, taille du motif, facteur de réduction, nom de l'image des coins)
+    :return: Coins détectés ou None
+    """
+    filename, pattern_size, scale, corner_name = task
+    img = cv2.imread(filename, 1)
+    if img is None:
+        print(f"Impossible de lire l'image {filename}")
+        return None
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    corners = find_corners(gray, pattern_size, scale)
+    if corners is not None and corner_name:
+        # Sauvegarde l'image avec les coins détectés (écriture directe : ce code tourne déjà dans un processus
+        # du pool, hors du chemin critique, et un thread d'écriture y serait arrêté avec le pool)
+        cv2.drawChessboardCorners(img, pattern_size, corners, True)
+        file_create(img, corner_name, 'png')
+    return corners
@@ -1,5 +1,5 @@
 import time
-from picamera2 import Picamera2, Preview
+from picamera2 import Picamera2, Preview, MappedArray
 import os
 import cv2  # OpenCV pour l'affichage des images
 
@@ -26,6 +26,7 @@ class DualCameraCapture:
         self.preview_type = preview_type
         self.capture_delay = capture_delay
         self.interval = interval
+        self.cameras = {}  # Caméras ouvertes en continu pour capture_gray, par ID
 
     def capture_and_save_image(self, picam_id, filename):
         """
@@ -51,6 +52,50 @@ class DualCameraCapture:
         # Fermeture de la caméra après la capture
         picam.close()
 
+    def open_camera(self, picam_id):
+        """
+        Ouvre et démarre une caméra en capture continue (sans aperçu), si elle ne l'est pas déjà.
+
+        :param picam_id: ID de la caméra à utiliser
+        :return: Instance de Picamera2 démarrée
+        """
+        picam = self.cameras.get(picam_id)
+        if picam is None:
+            picam = Picamera2(picam_id)
+            # Format BGR 24 bits, converti directement en niveaux de gris par OpenCV
+            picam.configure(picam.create_video_configuration(main={"size": self.preview_size, "format": "RGB888"}))
+            picam.start()
+            self.cameras[picam_id] = picam
+        return picam
+
+    def capture_gray(self, picam_id, out=None):
+        """
+        Capture une image en niveaux de gris depuis une caméra restée ouverte, sans passer par un fichier.
+
+        La conversion lit directement le tampon de la caméra (MappedArray), sans la copie faite par
+        capture_array : avec out, la capture n'alloue aucun tableau.
+
+        :param picam_id: ID de la caméra à utiliser
+        :param out: Tableau uint8 (hauteur, largeur) de sortie à réutiliser (facultatif)
+        :return: Image en niveaux de gris
+        """
+        request = self.open_camera(picam_id).capture_request()
+        try:
+            with MappedArray(request, "main") as mapped:
+                return cv2.cvtColor(mapped.array, cv2.COLOR_BGR2GRAY, dst=out)
+        finally:
+            # Le tampon est rendu à la caméra après la conversion
+            request.release()
+
+    def close_cameras(self):
+        """
+        Arrête et ferme les caméras ouvertes par open_camera.
+        """
+        for picam in self.cameras.values():
+            picam.stop()
+            picam.close()
+        self.cameras = {}
+
     def display_images(self, left_filename, right_filename):
         """
         Affiche les images capturées à partir des fichiers spécifiés.
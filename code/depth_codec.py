@@ -0,0 +1,193 @@
+import sys
+import time
+import zlib
+import struct
+import numpy as np
+
+#: En-tête d'une image encodée : signature, version, niveau zlib, hauteur, largeur, pas de quantification (m),
+#: longueur des données compressées
+HEADER = struct.Struct('!4sBBHHfI')
+MAGIC = b'DPQZ'
+VERSION = 1
+#: Valeur quantifiée des pixels invalides (profondeur nulle, négative, non finie ou hors plage)
+INVALID = 0
+#: Plus grande valeur quantifiée représentable
+MAX_VALUE = np.iinfo(np.uint16).max
+
+
+def quantize(depth, step=0.001, out=None):
+    """
+    Quantifie une profondeur en mètres en entiers 16 bits (au millimètre par défaut).
+
+    Les pixels invalides (profondeur nulle, négative, non finie ou au-delà de MAX_VALUE * step) valent INVALID.
+
+    :param depth: Profondeur en mètres (float)
+    :param step: Pas de quantification en mètres
+    :param out: Tableau uint16 de sortie à réutiliser (facultatif)
+    :return: Profondeur quantifiée (uint16)
+    """
+    scaled = np.multiply(depth, 1.0 / step, dtype=np.float32)
+    np.rint(scaled, out=scaled)
+    # Les comparaisons avec NaN sont fausses : les pixels non finis sont rejetés avec les autres
+    invalid = ~((scaled > 0) & (scaled <= MAX_VALUE))
+    scaled[invalid] = INVALID
+    if out is None:
+        out = np.empty(scaled.shape, np.uint16)
+    np.copyto(out, scaled, casting='unsafe')
+    return out
+
+
+def dequantize(quantized, step=0.001, out=None):
+    """
+    Convertit une profondeur quantifiée en mètres (les pixels invalides valent 0).
+
+    :param quantized: Profondeur quantifiée (uint16)
+    :param step: Pas de quantification en mètres
+    :param out: Tableau float32 de sortie à réutiliser (facultatif)
+    :return: Profondeur en mètres (float32)
+    """
+    return np.multiply(quantized, np.float32(step), out=out, dtype=np.float32)
+
+
+def encode(depth, step=0.001, level=1):
+    """
+    Encode une carte de profondeur sans perte au-delà de la quantification.
+
+    Étapes : quantification en uint16, prédiction par le pixel précédent (différences modulo 2^16, petites
+    sur les surfaces continues), séparation des octets de poids faible et de poids fort (les octets forts
+    des différences sont presque tous 0 ou 255), puis compression zlib. Le résultat sert aussi bien au
+    stockage qu'à la transmission.
+
+    :param depth: Profondeur en mètres (tableau 2D float) ou profondeur déjà quantifiée (uint16)
+    :param step: Pas de quantification en mètres
+    :param level: Niveau de compression zlib (1 : le plus rapide, 9 : le plus compact)
+    :return: Image encodée (bytes)
+    """
+    depth = np.asarray(depth)
+    if depth.ndim != 2:
+        raise ValueError("La carte de profondeur doit être un tableau 2D")
+    quantized = depth if depth.dtype == np.uint16 else quantize(depth, step)
+    height, width = quantized.shape
+
+    flat = np.ascontiguousarray(quantized).reshape(-1)
+    residual = np.empty(flat.size * 2, np.uint8)
+    if flat.size:
+        delta = np.empty_like(flat)
+        delta[0] = flat[0]
+        np.subtract(flat[1:], flat[:-1], out=delta[1:])  # Différences modulo 2^16
+        # Octets de poids faible puis octets de poids fort (ordre petit-boutiste)
+        residual.reshape(2, -1)[...] = delta.astype('<u2').view(np.uint8).reshape(-1, 2).T
+    payload = zlib.compress(residual, level)
+    return HEADER.pack(MAGIC, VERSION, level, height, width, step, len(payload)) + payload
+
+
+def read_header(data):
+    """
+    Lit l'en-tête d'une image encodée.
+
+    :param data: Image encodée (bytes)
+    :return: Tuple (hauteur, largeur, pas de quantification en mètres)
+    """
+    magic, version, _, height, width, step, length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Image de profondeur encodée invalide")
+    if len(data) < HEADER.size + length:
+        raise ValueError("Image de profondeur encodée tronquée")
+    return height, width, step
+
+
+def decode_quantized(data, out=None):
+    """
+    Décode une image encodée en profondeur quantifiée.
+
+    :param data: Image encodée (bytes)
+    :param out: Tableau uint16 de sortie préalloué (même forme), réutilisé d'une image à l'autre
+    :return: Tuple (profondeur quantifiée uint16, pas de quantification en mètres)
+    """
+    height, width, step = read_header(data)
+    if out is None:
+        out = np.empty((height, width), np.uint16)
+    elif out.shape != (height, width) or out.dtype != np.uint16:
+        raise ValueError(f"Tableau de sortie incompatible : {out.shape} {out.dtype}, attendu {(height, width)} uint16")
+    length = HEADER.unpack_from(data)[-1]
+    residual = np.frombuffer(zlib.decompress(memoryview(data)[HEADER.size:HEADER.size + length]), np.uint8)
+    if residual.size != 2 * height * width:
+        raise ValueError("Image de profondeur encodée corrompue")
+    flat = out.reshape(-1)
+    # Regroupement des octets faibles et forts, puis somme cumulée modulo 2^16 pour annuler la prédiction
+    low, high = residual.reshape(2, -1)
+    np.left_shift(high, 8, out=flat, dtype=np.uint16)
+    np.bitwise_or(flat, low, out=flat)
+    np.cumsum(flat, out=flat, dtype=np.uint16)
+    return out, step
+
+
+def decode(data, out=None, quantized=None):
+    """
+    Décode une image encodée en profondeur en mètres (0 pour les pixels invalides).
+
+    :param data: Image encodée (bytes)
+    :param out: Tableau float32 de sortie préalloué (même forme), réutilisé d'une image à l'autre
+    :param quantized: Tableau uint16 intermédiaire préalloué (facultatif)
+    :return: Profondeur en mètres (float32)
+    """
+    quantized, step = decode_quantized(data, quantized)
+    return dequantize(quantized, step, out)
+
+
+def benchmark(depth, step=0.001, level=1, repeats=20):
+    """
+    Mesure la taille et le débit d'encodage et de décodage sur une carte de profondeur.
+
+    :param depth: Profondeur en mètres (tableau 2D float)
+    :param step: Pas de quantification en mètres
+    :param level: Niveau de compression zlib
+    :param repeats: Nombre de répétitions des mesures
+    :return: Dictionnaire (tailles en octets, taux de compression, débits en Mo/s de profondeur float32,
+             erreur maximale en mètres sur les pixels valides)
+    """
+    depth = np.asarray(depth, np.float32)
+    encoded = encode(depth, step, level)
+    out = np.empty(depth.shape, np.float32)
+    quantized = np.empty(depth.shape, np.uint16)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        encode(depth, step, level)
+    encode_time = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        decode(encoded, out, quantized)
+    decode_time = (time.perf_counter() - start) / repeats
+
+    valid = quantized != INVALID
+    return {
+        "shape": list(depth.shape),
+        "raw_bytes": depth.nbytes,
+        "encoded_bytes": len(encoded),
+        "ratio": depth.nbytes / len(encoded),
+        "encode_ms": 1000 * encode_time,
+        "decode_ms": 1000 * decode_time,
+        "encode_mb_s": depth.nbytes / encode_time / 1e6,
+        "decode_mb_s": depth.nbytes / decode_time / 1e6,
+        "valid_ratio": float(valid.mean()),
+        "max_error": float(np.abs(out[valid] - depth[valid]).max()) if valid.any() else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    # Mesure sur des cartes de profondeur enregistrées (fichiers .npy ou .dpth)
+    if len(sys.argv) < 2:
+        print("Utilisation : python depth_codec.py profondeur.npy [...]")
+        sys.exit(1)
+    for file_name in sys.argv[1:]:
+        if file_name.endswith('.dpth'):
+            with open(file_name, 'rb') as file:
+                depth = decode(file.read())
+        else:
+            depth = np.nan_to_num(np.load(file_name))
+        result = benchmark(depth)
+        print(f"{file_name} : {result['raw_bytes']} -> {result['encoded_bytes']} octets "
+              f"(x{result['ratio']:.1f}), encodage {result['encode_ms']:.1f} ms ({result['encode_mb_s']:.0f} Mo/s), "
+              f"décodage {result['decode_ms']:.1f} ms ({result['decode_mb_s']:.0f} Mo/s), "
+              f"erreur max {1000 * result['max_error']:.2f} mm")
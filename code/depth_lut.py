@@ -0,0 +1,117 @@
+import cv2
+import numpy as np
+
+
+class DepthColorizer:
+    def __init__(self, depths, thresholds, depth_range, colormap=cv2.COLORMAP_JET):
+        """
+        Initialise la colorisation et la segmentation en bandes de profondeur par table de correspondance.
+
+        La table est construite une seule fois : pour chaque valeur brute possible (disparité en virgule fixe
+        ou profondeur en millimètres), elle contient la couleur (échelle fixe en mètres, proche en rouge,
+        lointain en bleu) et le numéro de la bande de profondeur. Les quatre octets (B, G, R, bande) sont
+        regroupés dans un entier 32 bits : une seule indexation produit l'image couleur et l'image des bandes,
+        sans normalisation min/max par image.
+
+        :param depths: Profondeur en mètres associée à chaque valeur brute (0 ou inf pour une valeur invalide)
+        :param thresholds: Limites des bandes de profondeur en mètres, croissantes ; la bande i (à partir de 1)
+                           couvre [thresholds[i - 1], thresholds[i]), 0 désigne les pixels hors bandes
+        :param depth_range: Profondeurs (proche, lointaine) en mètres des extrémités de l'échelle de couleurs
+        :param colormap: Carte de couleurs d'OpenCV
+        """
+        self.thresholds = list(thresholds)
+        self.depth_range = depth_range
+        depths = np.asarray(depths, np.float64)
+        valid = np.isfinite(depths) & (depths > 0)
+
+        # Position dans l'échelle de couleurs : 255 au plus proche, 0 au plus lointain
+        near, far = depth_range
+        intensity = np.clip((far - depths) / (far - near), 0, 1) * 255
+        intensity = np.where(valid, intensity, 0).astype(np.uint8)
+        palette = cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(-1, 1), colormap).reshape(256, 3)
+        colors = np.where(valid[:, None], palette[intensity], 0).astype(np.uint32)
+
+        labels = np.digitize(np.where(valid, depths, -1), self.thresholds)
+        labels[(labels == 0) | (labels == len(self.thresholds)) | ~valid] = 0
+        labels = labels.astype(np.uint32)
+
+        #: Table de correspondance : B | G << 8 | R << 16 | bande << 24
+        self.lut = colors[:, 0] | (colors[:, 1] << 8) | (colors[:, 2] << 16) | (labels << 24)
+        self.size = len(self.lut)
+
+    @classmethod
+    def for_disparity(cls, focale, baseline, max_disp, thresholds, depth_range, colormap=cv2.COLORMAP_JET):
+        """
+        Crée la table pour une disparité en virgule fixe (1/16 de pixel, comme OpenCV).
+
+        :param focale: Focale de la caméra en pixels
+        :param baseline: Distance entre les caméras en mètres
+        :param max_disp: Disparité maximale en pixels
+        :param thresholds: Limites des bandes de profondeur en mètres
+        :param depth_range: Profondeurs (proche, lointaine) de l'échelle de couleurs en mètres
+        :param colormap: Carte de couleurs d'OpenCV
+        """
+        fixed = np.arange(int(max_disp) * 16 + 1, dtype=np.float64)
+        with np.errstate(divide='ignore'):
+            depths = np.where(fixed > 0, focale * baseline * 16 / fixed, 0)
+        return cls(depths, thresholds, depth_range, colormap)
+
+    @classmethod
+    def for_depth(cls, max_distance, thresholds, depth_range=None, colormap=cv2.COLORMAP_JET):
+        """
+        Crée la table pour une profondeur en millimètres (caméra ToF).
+
+        :param max_distance: Distance maximale en mètres
+        :param thresholds: Limites des bandes de profondeur en mètres
+        :param depth_range: Profondeurs (proche, lointaine) de l'échelle de couleurs (par défaut 0 à max_distance)
+        :param colormap: Carte de couleurs d'OpenCV
+        """
+        depths = np.arange(int(max_distance * 1000) + 1, dtype=np.float64) / 1000
+        return cls(depths, thresholds, depth_range or (0, max_distance), colormap)
+
+    def index_from_disparity(self, disparity, out=None, work=None):
+        """
+        Convertit une disparité en pixels (float) en indices de la table.
+
+        :param disparity: Disparité en pixels (0 pour les pixels invalides)
+        :param out: Tableau d'entiers np.intp de sortie à réutiliser (facultatif)
+        :param work: Tableau float32 de travail à réutiliser (facultatif)
+        :return: Indices (np.intp, le type accepté par np.take sans conversion)
+        """
+        scaled = np.multiply(disparity, 16, out=work, dtype=np.float32)
+        np.clip(scaled, 0, self.size - 1, out=scaled)
+        if out is None:
+            return scaled.astype(np.intp)
+        np.copyto(out, scaled, casting='unsafe')
+        return out
+
+    def index_from_depth(self, depth, out=None, work=None):
+        """
+        Convertit une profondeur en mètres (float) en indices de la table (millimètres).
+
+        :param depth: Profondeur en mètres (0 pour les pixels invalides)
+        :param out: Tableau d'entiers np.intp de sortie à réutiliser (facultatif)
+        :param work: Tableau float32 de travail à réutiliser (facultatif)
+        :return: Indices (np.intp, le type accepté par np.take sans conversion)
+        """
+        scaled = np.multiply(depth, 1000, out=work, dtype=np.float32)
+        # Les profondeurs au-delà de la table sont invalides (indice 0)
+        cv2.threshold(scaled, self.size - 1, 0, cv2.THRESH_TOZERO_INV, dst=scaled)
+        np.clip(scaled, 0, None, out=scaled)
+        if out is None:
+            return scaled.astype(np.intp)
+        np.copyto(out, scaled, casting='unsafe')
+        return out
+
+    def apply(self, index, out=None):
+        """
+        Applique la table : une seule indexation donne l'image couleur et l'image des bandes.
+
+        :param index: Indices de la table (entiers, de préférence np.intp)
+        :param out: Tableau uint32 de sortie à réutiliser (facultatif)
+        :return: Tuple (image couleur BGR, image des numéros de bande), vues sur le même tableau
+        """
+        # Les indices sont déjà bornés : le mode 'clip' évite une copie intermédiaire du résultat
+        packed = np.take(self.lut, index, out=out, mode='clip')
+        channels = packed.view(np.uint8).reshape(packed.shape + (4,))
+        return channels[..., :3], channels[..., 3]
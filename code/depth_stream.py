@@ -0,0 +1,245 @@
+import os
+import json
+import time
+import socket
+import struct
+import threading
+import numpy as np
+
+#: En-tête d'un message : signature, version, longueur des métadonnées JSON, longueur des données
+HEADER = struct.Struct('!4sBxxxIQ')
+MAGIC = b'DPTH'
+VERSION = 1
+
+
+def encode_frame(array, metadata):
+    """
+    Encode un tableau et ses métadonnées dans un message binaire.
+
+    Format : en-tête (HEADER), métadonnées JSON (UTF-8) contenant au moins dtype et shape, puis les octets
+    bruts du tableau (ordre C).
+
+    :param array: Tableau NumPy à transmettre
+    :param metadata: Dictionnaire de métadonnées (sérialisable en JSON)
+    :return: Message encodé (bytes)
+    """
+    array = np.ascontiguousarray(array)
+    meta = dict(metadata, dtype=array.dtype.str, shape=list(array.shape))
+    meta_bytes = json.dumps(meta).encode('utf-8')
+    return b''.join((HEADER.pack(MAGIC, VERSION, len(meta_bytes), array.nbytes), meta_bytes, array.tobytes()))
+
+
+def _receive_into(sock, view):
+    """Remplit entièrement la vue mémoire avec les octets reçus sur la socket."""
+    received = 0
+    while received < len(view):
+        count = sock.recv_into(view[received:], len(view) - received)
+        if count == 0:
+            raise ConnectionError("Connexion fermée par le serveur")
+        received += count
+
+
+def _receive_exactly(sock, size):
+    """Lit exactement size octets sur la socket."""
+    buffer = bytearray(size)
+    _receive_into(sock, memoryview(buffer))
+    return buffer
+
+
+def _create_socket(address):
+    """Crée une socket TCP (address = (hôte, port)) ou Unix (address = chemin)."""
+    if isinstance(address, str):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+
+class _Subscriber:
+    def __init__(self, connection, on_close):
+        """
+        Abonné connecté au serveur : seule la dernière image de chaque flux est conservée en attente, un client
+        lent perd donc des images mais ne bloque jamais la capture.
+
+        :param connection: Socket connectée au client
+        :param on_close: Fonction appelée quand la connexion se termine
+        """
+        self.connection = connection
+        self.on_close = on_close
+        self.condition = threading.Condition()
+        self.pending = {}  # Dernier message en attente pour chaque flux
+        self.closed = False
+        self.dropped = 0  # Nombre d'images remplacées avant d'avoir été envoyées
+        self.thread = threading.Thread(target=self._send_loop, daemon=True)
+        self.thread.start()
+
+    def offer(self, name, message):
+        """Dépose le dernier message d'un flux, en remplaçant celui qui n'a pas encore été envoyé."""
+        with self.condition:
+            if name in self.pending:
+                self.dropped += 1
+            self.pending[name] = message
+            self.condition.notify()
+
+    def _send_loop(self):
+        """Envoie les messages en attente au client."""
+        try:
+            while True:
+                with self.condition:
+                    while not self.pending and not self.closed:
+                        self.condition.wait()
+                    if self.closed:
+                        return
+                    messages = list(self.pending.values())
+                    self.pending.clear()
+                for message in messages:
+                    self.connection.sendall(message)
+        except OSError:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        """Ferme la connexion de l'abonné."""
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify()
+        try:
+            self.connection.close()
+        except OSError:
+            pass
+        self.on_close(self)
+
+
+class DepthStreamServer:
+    def __init__(self, address=('127.0.0.1', 5600)):
+        """
+        Initialise le serveur de diffusion des cartes de profondeur vers des clients locaux.
+
+        :param address: Tuple (hôte, port) pour une socket TCP ou chemin pour une socket de domaine Unix
+        """
+        self.address = address
+        self.server = None
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.thread = None
+
+    def start(self):
+        """
+        Ouvre la socket d'écoute et accepte les clients dans un thread dédié.
+        """
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)  # Socket Unix restée d'une exécution précédente
+        self.server = _create_socket(self.address)
+        if not isinstance(self.address, str):
+            self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(self.address)
+        self.server.listen()
+        if not isinstance(self.address, str):
+            self.address = self.server.getsockname()  # Port réellement attribué si le port 0 a été demandé
+        self.thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self.thread.start()
+        print(f"Diffusion de la profondeur sur {self.address}")
+        return self
+
+    def _accept_loop(self):
+        """Accepte les nouveaux clients."""
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return  # Socket d'écoute fermée
+            with self.lock:
+                self.subscribers.append(_Subscriber(connection, self._remove))
+
+    def _remove(self, subscriber):
+        """Retire un abonné déconnecté."""
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+
+    def publish(self, array, name='depth', **metadata):
+        """
+        Publie une image à tous les abonnés.
+
+        Le message est encodé une seule fois (ce qui copie le tableau : l'appelant peut le réutiliser
+        ensuite), puis déposé chez chaque abonné sans attendre son envoi.
+
+        :param array: Tableau NumPy à publier
+        :param name: Nom du flux (par exemple 'depth', 'color', 'labels')
+        :param metadata: Métadonnées supplémentaires (sérialisables en JSON)
+        """
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.sequence += 1
+            sequence = self.sequence
+        if not subscribers:
+            return
+        message = encode_frame(array, dict(metadata, name=name, seq=sequence, timestamp=time.time()))
+        for subscriber in subscribers:
+            subscriber.offer(name, message)
+
+    def subscriber_count(self):
+        """Retourne le nombre de clients connectés."""
+        with self.lock:
+            return len(self.subscribers)
+
+    def close(self):
+        """
+        Ferme la socket d'écoute et les connexions des abonnés.
+        """
+        if self.server is not None:
+            try:
+                self.server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.server.close()
+            self.server = None
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+class DepthStreamClient:
+    def __init__(self, address=('127.0.0.1', 5600), timeout=None):
+        """
+        Client de réception des cartes de profondeur (utilisable pour les tests en boucle locale).
+
+        :param address: Adresse du serveur (tuple (hôte, port) ou chemin de socket Unix)
+        :param timeout: Délai maximal d'attente d'un message en secondes (None pour attendre indéfiniment)
+        """
+        self.sock = _create_socket(address)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+
+    def receive(self, out=None):
+        """
+        Reçoit le prochain message.
+
+        :param out: Tableau de sortie préalloué (même forme et même type) dans lequel recevoir les données
+        :return: Tuple (tableau, métadonnées)
+        """
+        magic, version, meta_len, payload_len = HEADER.unpack(_receive_exactly(self.sock, HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Message de profondeur invalide")
+        metadata = json.loads(_receive_exactly(self.sock, meta_len).decode('utf-8'))
+        dtype, shape = np.dtype(metadata["dtype"]), tuple(metadata["shape"])
+        if out is not None and out.dtype == dtype and out.shape == shape and out.flags['C_CONTIGUOUS']:
+            _receive_into(self.sock, memoryview(out.reshape(-1).view(np.uint8)))
+            return out, metadata
+        payload = _receive_exactly(self.sock, payload_len)
+        return np.frombuffer(payload, dtype=dtype).reshape(shape), metadata
+
+    def close(self):
+        """Ferme la connexion."""
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
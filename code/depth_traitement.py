@@ -5,7 +5,7 @@ from exception import show_image
 
 
 class DepthMapProcessor:
-    def __init__(self, depth_map, disparity, pixel_min=15000, min_contour_area=10, thresholds=[], kernel_size=5, dilate_iterations=1, erode_iterations=2):
+    def __init__(self, depth_map, disparity, pixel_min=15000, min_contour_area=10, thresholds=[], kernel_size=5, dilate_iterations=1, erode_iterations=2, labels=None):
         """
         Initialise la classe DepthMapProcessor avec les paramètres fournis.
 
@@ -13,10 +13,12 @@ class DepthMapProcessor:
         :param disparity: Carte de disparité normalisée
         :param pixel_min: Nombre minimum de pixels non nuls pour considérer un segment (par défaut 15000)
         :param min_contour_area: Aire minimale pour les contours à considérer (par défaut 10)
-        :param thresholds: Liste des seuils pour la segmentation de la disparité
+        :param thresholds: Liste des seuils pour la segmentation de la disparité (en mètres si labels est donné)
         :param kernel_size: Taille du noyau pour les opérations morphologiques (par défaut 5)
         :param dilate_iterations: Nombre d'itérations pour la dilatation (par défaut 1)
         :param erode_iterations: Nombre d'itérations pour l'érosion (par défaut 2)
+        :param labels: Image des numéros de bande de profondeur produite par DepthColorizer (facultatif) ; si elle
+                       est donnée, la bande i correspond aux seuils thresholds[i] - thresholds[i + 1] en mètres
         """
         self.depth_map_original = depth_map
         self.depth_map_normalized = disparity
@@ -26,6 +28,7 @@ class DepthMapProcessor:
         self.kernel_size = kernel_size
         self.dilate_iterations = dilate_iterations
         self.erode_iterations = erode_iterations
+        self.labels = labels
         self.segmented_image = None
         self.contours = []
         self.mean_amplitudes = {}
@@ -123,10 +126,14 @@ class DepthMapProcessor:
         for i in range(len(self.thresholds) - 1):
             lower_thresh = self.thresholds[i]
             upper_thresh = self.thresholds[i + 1]
-            # Création d'un masque pour le seuil actuel
-            mask = cv2.inRange(self.depth_map_normalized, lower_thresh, upper_thresh)
-            # Application du masque pour extraire la région d'intérêt
-            self.segmented_image = cv2.bitwise_and(self.depth_map_normalized, self.depth_map_normalized, mask=mask)
+            if self.labels is not None:
+                # Bande de profondeur en mètres, déjà calculée par la table de correspondance
+                self.segmented_image = cv2.compare(self.labels, i + 1, cv2.CMP_EQ)
+            else:
+                # Création d'un masque pour le seuil actuel
+                mask = cv2.inRange(self.depth_map_normalized, lower_thresh, upper_thresh)
+                # Application du masque pour extraire la région d'intérêt
+                self.segmented_image = cv2.bitwise_and(self.depth_map_normalized, self.depth_map_normalized, mask=mask)
 
             hist = calculate_histogram(self.segmented_image)
             non_zero_count = count_non_zero_pixels_from_histogram(hist)
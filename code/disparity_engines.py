@@ -0,0 +1,287 @@
+import abc
+import cv2
+import numpy as np
+
+
+class MatcherParameters:
+    def __init__(self, min_disp=0, num_disp=128, block_size=15, P1=150, P2=600, uniqueRatio=4,
+                 speckleWindowSize=200, speckleRange=4, disp12MaxDiff=0):
+        """
+        Paramètres communs à tous les moteurs de disparité (les moteurs ignorent ceux qui ne les concernent pas,
+        par exemple P1 et P2 pour StereoBM).
+
+        :param min_disp: Disparité minimale à considérer
+        :param num_disp: Nombre de disparités (multiple de 16)
+        :param block_size: Taille du bloc pour la correspondance stéréo (impaire)
+        :param P1: Pénalité de lissage pour une variation de disparité de 1 (SGBM)
+        :param P2: Pénalité de lissage pour une variation de disparité supérieure à 1 (SGBM)
+        :param uniqueRatio: Ratio d'unicité pour la correspondance stéréo
+        :param speckleWindowSize: Taille de la fenêtre pour filtrer les speckles (0 pour désactiver)
+        :param speckleRange: Plage de valeurs pour filtrer les speckles
+        :param disp12MaxDiff: Différence maximale entre les disparités gauche et droite
+        """
+        self.min_disp = min_disp
+        self.num_disp = num_disp
+        self.block_size = block_size
+        self.P1 = P1
+        self.P2 = P2
+        self.uniqueRatio = uniqueRatio
+        self.speckleWindowSize = speckleWindowSize
+        self.speckleRange = speckleRange
+        self.disp12MaxDiff = disp12MaxDiff
+
+    def key(self):
+        """Retourne un tuple identifiant les valeurs des paramètres."""
+        return tuple(sorted(self.__dict__.items()))
+
+
+class DisparityEngine(abc.ABC):
+    #: Nom sous lequel le moteur est enregistré
+    name = None
+
+    def __init__(self):
+        """
+        Moteur de calcul de disparité. Tous les moteurs partagent le même contrat de sortie : disparité en
+        virgule fixe (int16, 4 bits de partie fractionnaire, comme OpenCV) et masque des pixels valides.
+        """
+        self.matcher = None
+        self.matcher_key = None
+
+    @abc.abstractmethod
+    def create_matcher(self, params):
+        """
+        Crée l'objet de correspondance d'OpenCV (à définir par chaque moteur).
+
+        :param params: Instance de MatcherParameters
+        """
+
+    def compute(self, left, right, params, disparity=None, valid=None):
+        """
+        Calcule la disparité d'une paire rectifiée en niveaux de gris.
+
+        L'objet de correspondance n'est recréé que si les paramètres ont changé.
+
+        :param left: Image gauche rectifiée (uint8)
+        :param right: Image droite rectifiée (uint8)
+        :param params: Instance de MatcherParameters
+        :param disparity: Tableau int16 de sortie à réutiliser (facultatif)
+        :param valid: Tableau booléen de sortie à réutiliser pour le masque (facultatif)
+        :return: Tuple (disparité en virgule fixe int16, masque booléen des pixels valides)
+        """
+        key = params.key()
+        if self.matcher is None or key != self.matcher_key:
+            self.matcher = self.create_matcher(params)
+            self.matcher_key = key
+        disparity = self.matcher.compute(left, right, disparity)
+        # Les pixels invalides valent (min_disp - 1) * 16
+        if valid is None or valid.shape != disparity.shape:
+            valid = None
+        valid = np.greater_equal(disparity, params.min_disp * 16, out=valid)
+        return disparity, valid
+
+
+class StereoBMEngine(DisparityEngine):
+    name = "bm"
+
+    def create_matcher(self, params):
+        """Crée un StereoBM (bloc par bloc, le moins coûteux)."""
+        # StereoBM impose une taille de bloc impaire entre 5 et 255
+        block_size = min(max(params.block_size | 1, 5), 255)
+        matcher = cv2.StereoBM_create(numDisparities=params.num_disp, blockSize=block_size)
+        matcher.setMinDisparity(params.min_disp)
+        matcher.setUniquenessRatio(params.uniqueRatio)
+        matcher.setSpeckleWindowSize(params.speckleWindowSize)
+        matcher.setSpeckleRange(params.speckleRange)
+        matcher.setDisp12MaxDiff(params.disp12MaxDiff)
+        return matcher
+
+
+class SGBMEngine(DisparityEngine):
+    name = "sgbm"
+    #: Mode de StereoSGBM
+    mode = cv2.STEREO_SGBM_MODE_SGBM
+
+    def create_matcher(self, params):
+        """Crée un StereoSGBM dans le mode de la classe."""
+        return cv2.StereoSGBM_create(
+            minDisparity=params.min_disp,
+            numDisparities=params.num_disp,
+            blockSize=params.block_size,
+            P1=params.P1,
+            P2=params.P2,
+            uniquenessRatio=params.uniqueRatio,
+            speckleWindowSize=params.speckleWindowSize,
+            speckleRange=params.speckleRange,
+            disp12MaxDiff=params.disp12MaxDiff,
+            mode=self.mode)
+
+
+class SGBM3WayEngine(SGBMEngine):
+    name = "sgbm_3way"
+    mode = cv2.STEREO_SGBM_MODE_SGBM_3WAY
+
+
+class SGBMHHEngine(SGBMEngine):
+    name = "hh"
+    mode = cv2.STEREO_SGBM_MODE_HH
+
+
+class IncrementalEngine(DisparityEngine):
+    name = "incremental"
+
+    def __init__(self, engine, tile_size=64, threshold=4.0, refresh_interval=30):
+        """
+        Moteur incrémental pour les scènes en grande partie statiques (caméras fixes).
+
+        Les images rectifiées sont comparées à celles de l'image précédente par tuiles ; la correspondance n'est
+        relancée que sur les bandes contenant des tuiles modifiées (avec une marge couvrant la plage de
+        disparité et la taille de bloc), la disparité des autres tuiles est reprise de l'image précédente. Un
+        calcul complet est fait toutes les refresh_interval images pour borner la dérive.
+
+        Avec StereoBM, le résultat est identique à un calcul complet, y compris avec la vérification gauche-droite
+        (disp12MaxDiff >= 0), dont la portée supplémentaire d'une plage de disparité est couverte par les marges.
+        Avec StereoSGBM, il est approché : l'agrégation des coûts le long des chemins est coupée au bord de la
+        bande, quelques pixels près des bords des tuiles recalculées diffèrent d'un calcul complet. Le filtrage
+        des speckles porte lui aussi sur la seule bande.
+
+        :param engine: Moteur de disparité utilisé pour les calculs (instance de DisparityEngine)
+        :param tile_size: Taille des tuiles en pixels
+        :param threshold: Différence moyenne de niveau de gris au-delà de laquelle une tuile est modifiée
+        :param refresh_interval: Nombre d'images entre deux calculs complets
+        """
+        super().__init__()
+        self.engine = engine
+        self.tile_size = tile_size
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.previous = None  # Images rectifiées (gauche, droite) de l'image précédente
+        self.disparity = None  # Dernière disparité calculée (int16)
+        self.valid = None  # Dernier masque de validité
+        self.frames_since_refresh = 0
+        self.changed_ratio = 1.0  # Proportion de tuiles recalculées à la dernière image
+
+    def create_matcher(self, params):
+        """Crée l'objet de correspondance du moteur enveloppé."""
+        return self.engine.create_matcher(params)
+
+    @staticmethod
+    def _consistency_reach(params):
+        """
+        Portée supplémentaire de la vérification gauche-droite (disp12MaxDiff >= 0) : la disparité droite lue
+        en x - d est calculée avec les pixels gauches de x - d + min_disp à x - d + max_disp, soit jusqu'à une
+        plage de disparité de part et d'autre de x.
+        """
+        return params.num_disp if params.disp12MaxDiff >= 0 else 0
+
+    def changed_tiles(self, left, right, params):
+        """
+        Détermine les tuiles dont la disparité doit être recalculée.
+
+        :return: Masque booléen (rangées de tuiles, colonnes de tuiles)
+        """
+        tile = self.tile_size
+        height, width = left.shape[:2]
+        rows = np.arange(0, height, tile)
+        cols = np.arange(0, width, tile)
+        counts = np.outer(np.diff(np.append(rows, height)), np.diff(np.append(cols, width)))
+
+        def tile_change(image, previous):
+            diff = cv2.absdiff(image, previous)
+            sums = np.add.reduceat(np.add.reduceat(diff, rows, axis=0, dtype=np.uint32), cols, axis=1)
+            return sums / counts > self.threshold
+
+        changed_left = tile_change(left, self.previous[0])
+        changed_right = tile_change(right, self.previous[1])
+        changed = changed_left.copy()
+        columns = changed_right.shape[1]
+        consistency = self._consistency_reach(params)
+        # Un changement dans l'image droite en x touche les pixels gauches de x + min_disp à x + max_disp :
+        # vers la droite jusqu'à la disparité maximale, vers la gauche si la disparité minimale est négative,
+        # plus la portée de la vérification gauche-droite dans les deux sens
+        reach = int(np.ceil((max(params.min_disp, 0) + params.num_disp + consistency) / tile))
+        for shift in range(reach + 1):
+            changed[:, shift:] |= changed_right[:, :columns - shift]
+        left_reach = int(np.ceil((-min(params.min_disp, 0) + consistency) / tile))
+        for shift in range(1, left_reach + 1):
+            changed[:, :columns - shift] |= changed_right[:, shift:]
+        # Un changement dans l'image gauche est relu par la vérification gauche-droite jusqu'à une plage de
+        # disparité de part et d'autre
+        for shift in range(1, int(np.ceil(consistency / tile)) + 1):
+            changed[:, shift:] |= changed_left[:, :columns - shift]
+            changed[:, :columns - shift] |= changed_left[:, shift:]
+        # Marge d'une tuile pour l'agrégation des coûts autour des zones modifiées
+        return cv2.dilate(changed.astype(np.uint8), np.ones((3, 3), np.uint8)).astype(bool)
+
+    def compute(self, left, right, params, disparity=None, valid=None):
+        """
+        Calcule la disparité en ne recalculant que les zones modifiées depuis l'image précédente.
+
+        Les tableaux retournés appartiennent au moteur et sont mis à jour à l'appel suivant (les tableaux de
+        sortie éventuellement fournis ne sont pas utilisés).
+
+        :return: Tuple (disparité en virgule fixe int16, masque booléen des pixels valides)
+        """
+        key = params.key()
+        full = (self.previous is None or self.previous[0].shape != left.shape or key != self.matcher_key
+                or self.frames_since_refresh >= self.refresh_interval)
+        if full:
+            self.disparity, self.valid = self.engine.compute(left, right, params)
+            self.disparity, self.valid = self.disparity.copy(), self.valid.copy()
+            self.previous = (left.copy(), right.copy())
+            self.matcher_key = key
+            self.frames_since_refresh = 0
+            self.changed_ratio = 1.0
+            return self.disparity, self.valid
+
+        changed = self.changed_tiles(left, right, params)
+        self.changed_ratio = changed.mean()
+        self.frames_since_refresh += 1
+
+        tile = self.tile_size
+        height, width = left.shape[:2]
+        consistency = self._consistency_reach(params)
+        margin_x = max(params.min_disp, 0) + params.num_disp + consistency + params.block_size // 2
+        margin_y = params.block_size // 2 + 1
+        changed_rows = np.flatnonzero(changed.any(axis=1))
+        # Regroupement des rangées de tuiles modifiées consécutives en bandes
+        bands = np.split(changed_rows, np.flatnonzero(np.diff(changed_rows) > 1) + 1) if changed_rows.size else []
+        for band in bands:
+            cols = np.flatnonzero(changed[band].any(axis=0))
+            y0, y1 = band[0] * tile, min((band[-1] + 1) * tile, height)
+            x0, x1 = cols[0] * tile, min((cols[-1] + 1) * tile, width)
+            # Zone de calcul élargie : contexte vertical du bloc, plage de disparité à gauche, et à droite pour
+            # les disparités négatives (pixels droits jusqu'à x1 + |min_disp| + block_size // 2) et la
+            # vérification gauche-droite (pixels gauches jusqu'à x1 + num_disp + block_size // 2)
+            cy0, cy1 = max(y0 - margin_y, 0), min(y1 + margin_y, height)
+            cx0 = max(x0 - margin_x, 0)
+            cx1 = min(x1 + max(-params.min_disp, 0) + consistency + params.block_size // 2 + 1, width)
+            band_disparity, band_valid = self.engine.compute(np.ascontiguousarray(left[cy0:cy1, cx0:cx1]),
+                                                             np.ascontiguousarray(right[cy0:cy1, cx0:cx1]),
+                                                             params)
+            # Recopie des seules tuiles modifiées de la bande
+            for row in band:
+                ty0, ty1 = row * tile, min((row + 1) * tile, height)
+                for col in np.flatnonzero(changed[row]):
+                    tx0, tx1 = col * tile, min((col + 1) * tile, width)
+                    self.disparity[ty0:ty1, tx0:tx1] = band_disparity[ty0 - cy0:ty1 - cy0, tx0 - cx0:tx1 - cx0]
+                    self.valid[ty0:ty1, tx0:tx1] = band_valid[ty0 - cy0:ty1 - cy0, tx0 - cx0:tx1 - cx0]
+
+        np.copyto(self.previous[0], left)
+        np.copyto(self.previous[1], right)
+        return self.disparity, self.valid
+
+
+#: Moteurs disponibles, par nom
+ENGINES = {engine.name: engine for engine in (StereoBMEngine, SGBMEngine, SGBM3WayEngine, SGBMHHEngine)}
+
+
+def create_engine(name):
+    """
+    Crée un moteur de disparité à partir de son nom.
+
+    :param name: Nom du moteur ('bm', 'sgbm', 'sgbm_3way' ou 'hh')
+    :return: Instance de DisparityEngine
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Moteur de disparité inconnu : {name} (disponibles : {', '.join(ENGINES)})")
+    return ENGINES[name]()
@@ -0,0 +1,122 @@
+import cv2
+import numpy as np
+
+
+class DisparityHoleFiller:
+    def __init__(self, mode='fast', radius=8, eps=1e-3, subsample=4, levels=3, min_support=1e-2,
+                 keep_valid=True):
+        """
+        Initialise le remplissage des trous de la carte de disparité.
+
+        Les pixels invalides (disparité nulle) sont remplis par un filtre guidé normalisé : le filtre est
+        appliqué à la disparité masquée et au masque de validité, avec l'image gauche rectifiée comme guide,
+        puis le premier résultat est divisé par le second. Le filtre ne dépend que de filtres moyenneurs
+        (boxFilter), son coût est donc linéaire en nombre de pixels quel que soit le rayon, et les bords de
+        l'image guide sont préservés.
+
+        :param mode: 'guided' (filtre guidé en pleine résolution) ou 'fast' (coefficients calculés sur une image
+                     sous-échantillonnée, adapté à la Raspberry Pi)
+        :param radius: Rayon de la fenêtre du filtre en pixels (pleine résolution)
+        :param eps: Régularisation du filtre guidé (guide normalisé entre 0 et 1)
+        :param subsample: Facteur de sous-échantillonnage du mode 'fast'
+        :param levels: Nombre maximal de passes, le rayon effectif doublant à chaque passe
+        :param min_support: Proportion minimale de pixels valides dans la fenêtre pour remplir un pixel
+        :param keep_valid: Si True, seuls les pixels invalides sont remplacés
+        """
+        if mode not in ('guided', 'fast'):
+            raise ValueError(f"Mode de remplissage inconnu : {mode}")
+        self.mode = mode
+        self.radius = radius
+        self.eps = eps
+        self.subsample = subsample if mode == 'fast' else 1
+        self.levels = levels
+        self.min_support = min_support
+        self.keep_valid = keep_valid
+
+    def _box(self, image, radius):
+        """Moyenne sur une fenêtre carrée de rayon donné."""
+        return cv2.boxFilter(image, -1, (2 * radius + 1, 2 * radius + 1), normalize=True,
+                             borderType=cv2.BORDER_REFLECT)
+
+    def _coefficients(self, guide, mean_guide, var_guide, source, radius):
+        """
+        Calcule les coefficients linéaires (a, b) du filtre guidé pour une image source.
+
+        :return: Moyennes locales des coefficients a et b
+        """
+        mean_source = self._box(source, radius)
+        cov = self._box(guide * source, radius) - mean_guide * mean_source
+        a = cov / (var_guide + self.eps)
+        b = mean_source - a * mean_guide
+        return self._box(a, radius), self._box(b, radius)
+
+    def _filter(self, guide_full, weighted, valid, subsample, radius):
+        """
+        Applique le filtre guidé à la disparité masquée et au masque de validité.
+
+        :return: Tuple (disparité filtrée, support filtré), en pleine résolution
+        """
+        if subsample > 1:
+            # Les coefficients du filtre sont calculés sur des images réduites, puis agrandis
+            height, width = weighted.shape[:2]
+            small_size = (max(1, width // subsample), max(1, height // subsample))
+            guide_small = cv2.resize(guide_full, small_size, interpolation=cv2.INTER_AREA)
+            weighted_small = cv2.resize(weighted, small_size, interpolation=cv2.INTER_AREA)
+            valid_small = cv2.resize(valid, small_size, interpolation=cv2.INTER_AREA)
+            radius = max(1, radius // subsample)
+        else:
+            guide_small, weighted_small, valid_small = guide_full, weighted, valid
+
+        mean_guide = self._box(guide_small, radius)
+        var_guide = self._box(guide_small * guide_small, radius) - mean_guide * mean_guide
+        coefficients = [self._coefficients(guide_small, mean_guide, var_guide, source, radius)
+                        for source in (weighted_small, valid_small)]
+
+        if subsample > 1:
+            size = (weighted.shape[1], weighted.shape[0])
+            coefficients = [tuple(cv2.resize(c, size, interpolation=cv2.INTER_LINEAR) for c in pair)
+                            for pair in coefficients]
+
+        (a_disp, b_disp), (a_valid, b_valid) = coefficients
+        return a_disp * guide_full + b_disp, a_valid * guide_full + b_valid
+
+    def fill(self, disparity, guide, disparity_range=None):
+        """
+        Remplit les pixels invalides de la carte de disparité.
+
+        Les trous plus larges que la fenêtre sont remplis par des passes supplémentaires dont le rayon double
+        à chaque niveau (le mode 'fast' double plutôt le sous-échantillonnage, ce qui garde un coût constant).
+
+        Les coefficients agrandis du mode 'fast' peuvent dépasser près des contours : une valeur remplie hors de
+        la plage du moteur de disparité n'est pas retenue (le pixel est laissé aux passes suivantes, puis
+        reste invalide).
+
+        :param disparity: Carte de disparité en float32 (0 pour les pixels invalides)
+        :param guide: Image gauche rectifiée en niveaux de gris (uint8)
+        :param disparity_range: Plage (min, max) des disparités possibles, max exclu (par défaut seules les
+                                valeurs négatives sont écartées)
+        :return: Carte de disparité remplie (float32)
+        """
+        valid = (disparity > 0).astype(np.float32)
+        guide_full = guide.astype(np.float32) / 255.0
+        weighted = disparity.astype(np.float32) * valid
+
+        low, high = (0, np.inf) if disparity_range is None else (max(disparity_range[0], 0), disparity_range[1])
+        result = np.zeros_like(weighted)
+        missing = np.ones(weighted.shape, bool)
+        for level in range(self.levels):
+            subsample = self.subsample * 2 ** level if self.subsample > 1 else 1
+            filtered, support = self._filter(guide_full, weighted, valid, subsample, self.radius * 2 ** level)
+            # Division normalisée là où la fenêtre contient suffisamment de pixels valides, en ne gardant que
+            # les valeurs dans la plage du moteur
+            supported = missing & (support > self.min_support)
+            value = np.divide(filtered, support, out=np.zeros_like(filtered), where=supported)
+            supported &= (value >= low) & (value < high)
+            result[supported] = value[supported]
+            missing &= ~supported
+            if not missing.any():
+                break
+
+        if self.keep_valid:
+            result[valid > 0] = disparity[valid > 0]
+        return result
@@ -2,6 +2,7 @@ import os
 import cv2
 import numpy as np
 import csv
+import depth_codec
 
 
 def folder_create(folder):
@@ -30,8 +31,10 @@ def file_create(data, file_name, file_type, folder_name=None):
 
     :param data: Données à enregistrer dans le fichier
     :param file_name: Nom du fichier à créer (sans extension)
-    :param file_type: Type de fichier à créer ('csv', 'image', 'npy', etc.)
+    :param file_type: Type de fichier à créer ('csv', 'png', 'jpg', 'npy', 'bin' pour un fichier binaire brut
+                      ou 'dpth' pour une carte de profondeur en mètres compressée)
     :param folder_name: Dossier dans lequel créer le fichier (facultatif)
+    :return: True si le fichier a été écrit, False en cas d'erreur
     """
     # Construction du chemin complet du fichier
     if folder_name:
@@ -43,14 +46,28 @@ def file_create(data, file_name, file_type, folder_name=None):
         # Vérifie le type de fichier et appelle la fonction d'écriture appropriée
         if file_type in ['jpg', 'png']:
             # Pour les images (formats jpg, png), utilise OpenCV pour enregistrer l'image
-            cv2.imwrite(name, data)
+            if not cv2.imwrite(name, data):
+                raise OSError("écriture refusée par OpenCV")
 
         elif file_type == 'npy':
             # Pour les fichiers NumPy (.npy), utilise NumPy pour sauvegarder les données
             np.save(name, data)
 
+        elif file_type == 'bin':
+            # Pour les gros tableaux, écrit les octets bruts et un en-tête texte décrivant le tableau
+            binary_create(data, name)
+
+        elif file_type == 'dpth':
+            # Pour les cartes de profondeur, quantification au millimètre et compression sans perte
+            with open(name, 'wb') as file:
+                file.write(depth_codec.encode(data))
+
+        elif file_type == 'csv' and isinstance(data, (np.ndarray, np.generic)) and data.dtype.kind in 'biuf':
+            # Pour les tableaux numériques, formatage vectorisé par blocs
+            csv_array_create(data, name)
+
         elif file_type == 'csv':
-            # Pour les fichiers CSV, utilise le module csv pour écrire les données
+            # Pour les autres données, utilise le module csv pour écrire les données
             with open(name, 'w', newline='') as csvfile:
                 writer = csv.writer(csvfile, delimiter=';')
                 for row in data:
@@ -63,9 +80,87 @@ def file_create(data, file_name, file_type, folder_name=None):
                             processed_row.append(item)
                     writer.writerow(processed_row)
 
+        else:
+            raise ValueError(f"type de fichier inconnu : {file_type}")
+
     except Exception as e:
         # En cas d'erreur lors de la création du fichier, affiche un message d'erreur
         print(f"Une erreur est survenue lors de la création du fichier '{name}': {e}")
+        return False
+    return True
+
+
+def csv_array_create(data, name, chunk_size=1 << 20):
+    """
+    Écrit un tableau numérique dans un fichier CSV (séparateur ';', virgule décimale).
+
+    Le formatage est fait par blocs de lignes avec une seule opération de formatage par bloc, ce qui évite
+    une boucle Python sur chaque valeur et borne la mémoire utilisée pour les grands tableaux. Un tableau
+    1-D est écrit sur une seule ligne, un tableau à plus de deux dimensions est aplati en lignes de sa
+    dernière dimension.
+
+    :param data: Tableau NumPy numérique
+    :param name: Chemin complet du fichier
+    :param chunk_size: Nombre approximatif de valeurs formatées par bloc
+    """
+    array = np.asarray(data)
+    if array.ndim < 2:
+        array = array.reshape(1, -1)
+    elif array.ndim > 2:
+        array = array.reshape(-1, array.shape[-1])
+
+    # Format d'une valeur : entier, flottant 32 bits (9 chiffres significatifs) ou repr du flottant 64 bits
+    if array.dtype.kind in 'biu':
+        value_format = '%d'
+    elif array.dtype.itemsize <= 4:
+        value_format = '%.9g'
+    else:
+        value_format = '%r'
+    rows, columns = array.shape
+    row_format = ';'.join([value_format] * columns) + '\r\n'
+    chunk_rows = max(1, chunk_size // max(columns, 1))
+
+    with open(name, 'w', newline='') as csvfile:
+        if columns == 0:
+            return
+        for start in range(0, rows, chunk_rows):
+            chunk = array[start:start + chunk_rows]
+            text = (row_format * len(chunk)) % tuple(chunk.ravel().tolist())
+            csvfile.write(text.replace('.', ','))
+
+
+def binary_create(data, name):
+    """
+    Écrit un tableau sous forme binaire brute, accompagné d'un en-tête texte (name + '.hdr').
+
+    L'en-tête contient le type et la forme du tableau, ce qui permet de relire le fichier avec binary_load,
+    éventuellement en projection mémoire.
+
+    :param data: Tableau NumPy à enregistrer
+    :param name: Chemin complet du fichier
+    """
+    array = np.ascontiguousarray(data)
+    with open(name + '.hdr', 'w') as header:
+        header.write(array.dtype.str + ';' + ','.join(str(size) for size in array.shape) + '\n')
+    array.tofile(name)
+
+
+def binary_load(file_name, folder_name=None, mmap=True):
+    """
+    Relit un fichier écrit avec le type 'bin' de file_create.
+
+    :param file_name: Nom du fichier (sans extension)
+    :param folder_name: Dossier contenant le fichier (facultatif)
+    :param mmap: Si True, projette le fichier en mémoire au lieu de le lire entièrement
+    :return: Tableau NumPy
+    """
+    name = (folder_name + '/' if folder_name else '') + file_name + '.bin'
+    with open(name + '.hdr') as header:
+        dtype, shape = header.read().strip().split(';')
+    shape = tuple(int(size) for size in shape.split(',') if size)
+    if mmap:
+        return np.memmap(name, dtype=np.dtype(dtype), mode='r', shape=shape)
+    return np.fromfile(name, dtype=np.dtype(dtype)).reshape(shape)
 
 
 
@@ -101,4 +196,18 @@ def show_image(title, image, cmap='gray'):
         print("La couleur sélectionner n'est pas disponible. Couleur par défaut appliquée")
     cv2.imshow(title, image)
     cv2.waitKey(0)
-    cv2.destroyAllWindows()
\ No newline at end of file
+    cv2.destroyAllWindows()
+
+
+def depth_load(file_name, folder_name=None, out=None):
+    """
+    Relit une carte de profondeur écrite avec le type 'dpth' de file_create.
+
+    :param file_name: Nom du fichier (sans extension)
+    :param folder_name: Dossier contenant le fichier (facultatif)
+    :param out: Tableau float32 de sortie préalloué (facultatif)
+    :return: Profondeur en mètres (float32, 0 pour les pixels invalides)
+    """
+    name = (folder_name + '/' if folder_name else '') + file_name + '.dpth'
+    with open(name, 'rb') as file:
+        return depth_codec.decode(file.read(), out)
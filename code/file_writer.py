@@ -0,0 +1,139 @@
+import os
+import atexit
+import threading
+import queue
+import numpy as np
+from exception import file_create
+
+
+class BackgroundWriter:
+    def __init__(self, max_pending=16, workers=2, block=True):
+        """
+        Initialise l'écrivain de fichiers en arrière-plan.
+
+        Les demandes d'écriture sont placées dans une file bornée et traitées par des threads dédiés, qui
+        encodent et écrivent les données avec file_create en dehors de la boucle principale.
+
+        :param max_pending: Nombre maximal d'écritures en attente dans la file
+        :param workers: Nombre de threads d'écriture
+        :param block: Si True, submit attend qu'une place se libère quand la file est pleine, sinon la
+                      demande est abandonnée
+        """
+        self.block = block
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.threads = []
+        self.dropped = 0  # Nombre d'écritures abandonnées (file pleine ou écrivain fermé)
+        self.closed = False
+        # Protège la file contre un ajout après la fermeture (demande qui ne serait jamais traitée)
+        self.lock = threading.Lock()
+        for _ in range(workers):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def _worker(self):
+        """Boucle d'un thread d'écriture."""
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                file_create(*job)
+            finally:
+                self.queue.task_done()
+
+    def submit(self, data, file_name, file_type, folder_name=None, copy=False):
+        """
+        Demande l'écriture d'un fichier en arrière-plan (mêmes paramètres que file_create).
+
+        L'écrivain prend possession du tableau : l'appelant ne doit plus le modifier ensuite, sauf avec
+        copy=True qui en fait une copie.
+
+        :param data: Données à enregistrer dans le fichier
+        :param file_name: Nom du fichier à créer (sans extension)
+        :param file_type: Type de fichier à créer ('csv', 'png', 'npy', etc.)
+        :param folder_name: Dossier dans lequel créer le fichier (facultatif)
+        :param copy: Copier les données avant de les placer dans la file
+        :return: True si la demande a été acceptée, False si elle a été abandonnée (file pleine ou écrivain
+                 fermé)
+        """
+        if copy:
+            data = np.array(data, copy=True)
+        with self.lock:
+            if self.closed:
+                self.dropped += 1
+                print(f"Écrivain fermé, le fichier '{file_name}' n'est pas enregistré")
+                return False
+            try:
+                # Les threads d'écriture tournent tant que l'écrivain est ouvert : un ajout bloquant se termine
+                self.queue.put((data, file_name, file_type, folder_name), block=self.block)
+            except queue.Full:
+                self.dropped += 1
+                print(f"File d'écriture pleine, le fichier '{file_name}' n'est pas enregistré")
+                return False
+        return True
+
+    def pending(self):
+        """
+        Retourne le nombre d'écritures en attente.
+
+        :return: Nombre de demandes non encore terminées
+        """
+        return self.queue.unfinished_tasks
+
+    def flush(self):
+        """
+        Attend que toutes les écritures en attente soient terminées.
+        """
+        self.queue.join()
+
+    def close(self):
+        """
+        Termine les écritures en attente puis arrête les threads d'écriture. Les demandes suivantes sont
+        abandonnées.
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.flush()
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+
+_writer = None
+_writer_pid = None
+
+
+def get_writer():
+    """
+    Retourne l'écrivain en arrière-plan partagé du processus courant (créé au premier appel).
+
+    Un processus créé par fork n'hérite pas des threads : un nouvel écrivain est alors créé.
+
+    :return: Instance de BackgroundWriter
+    """
+    global _writer, _writer_pid
+    if _writer is None or _writer_pid != os.getpid():
+        _writer = BackgroundWriter()
+        _writer_pid = os.getpid()
+    return _writer
+
+
+def close_writer():
+    """
+    Termine les écritures de l'écrivain partagé du processus courant et l'arrête.
+
+    Les processus de multiprocessing ne passent pas par atexit : ils doivent appeler cette fonction avant
+    de se terminer.
+    """
+    global _writer
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.close()
+    _writer = None
+
+
+atexit.register(close_writer)
@@ -1,25 +1,32 @@
 import multiprocessing
-from time import sleep
-import cv2
-import psutil
-import sys
 import os
-import shutil
-import signal
+import sys
 
 from tof_sensor import TofCamera
-from stereo_vision import StereoVision, DualCameraCapture
-from calibration_camera import Calibrator
+from stereo_vision import StereoVision
+from camera_control import DualCameraCapture
+from calibration_camera import Calibrator, StereoCalibration
 from exception import folder_create
+from depth_stream import DepthStreamServer
+from supervisor import ProcessSupervisor
+from multi_rig import MultiRig
+
+# Adresses locales de diffusion de la profondeur en mode sans affichage
+STEREO_STREAM_ADDRESS = ('127.0.0.1', 5601)
+TOF_STREAM_ADDRESS = ('127.0.0.1', 5602)
+# Résolution de capture de la vision stéréo (les cartes de rectification sont adaptées à cette résolution)
+STEREO_IMAGE_SIZE = (800, 600)
+# Description des paires stéréo du multiplexeur de caméras ; si le fichier existe, toutes les paires sont calculées
+# par un seul processus à la place de la paire unique
+RIGS_CONFIG = 'data/rigs.json'
 
 
 def calibrate_cameras(cam_capture):
     print("Début de la calibration des caméras...")
     
-    # Paramètres de calibration
-    img_width = 800
-    img_height = 600
-    image_size = (img_width, img_height)
+    # Paramètres de calibration : la taille est celle des photos de calibration, les cartes de rectification
+    # sont ensuite adaptées à la résolution de chaque utilisation
+    image_size = cam_capture.preview_size
     
     # Prendre les photos nécessaires pour la calibration
     nbr_photos = int(input("Donner le nombre d'images à prendre pour la calibration : "))
@@ -30,31 +37,34 @@ def calibrate_cameras(cam_capture):
     cam_capture.capture_images(nbr_photos=nbr_photos, image_folder="image")
 
     calibrator = Calibrator(rows, columns, square_size, image_size)
-    calibration = calibrator.calibration_process(nbr_photos, 'image')
-
-    # Sauvegarde des données de calibration
-    calibration.save('data')
+    # Calibration et sauvegarde des données dans 'data'
+    calibrator.calibration_process(nbr_photos, 'image')
 
     print("Calibration terminée.")
 
 
-def run_tof_camera(camera_queue):
-    tof_camera = TofCamera(max_distance=4)
-    tof_camera.continuous_display()
-    while True:
-        depth_buf = tof_camera.get_depth_buf()
-        depth_normalized = tof_camera.get_depth_normalized()
-        if depth_buf is not None and depth_normalized is not None:
-            camera_queue.put((depth_buf, depth_normalized))
-        sleep(1)
-
-
-def run_stereo_vision():
-    img_width = 800
-    img_height = 600
-    image_size = (img_width, img_height)
-    cam_capture = DualCameraCapture(left_cam_id=2, right_cam_id=1, preview_size=image_size)
-    stereo_vision = StereoVision(cam_capture)
+def run_tof_camera(camera_queue, stream_address=None, heartbeat=None, stop_event=None):
+    tof_camera = TofCamera(max_distance=4, heartbeat=heartbeat)
+    if stream_address is not None:
+        # Mode sans affichage : la profondeur est diffusée aux clients locaux
+        tof_camera.stream(DepthStreamServer(stream_address).start(), stop_event)
+        return
+    tof_camera.continuous_display(stop_event)
+    depth_buf = tof_camera.get_depth_buf()
+    depth_normalized = tof_camera.get_depth_normalized()
+    if depth_buf is not None and depth_normalized is not None:
+        camera_queue.put((depth_buf, depth_normalized))
+        # La file n'a pas forcément de lecteur : la fin du processus ne doit pas attendre son vidage
+        camera_queue.cancel_join_thread()
+
+
+def run_stereo_vision(stream_address=None, calibration=None, heartbeat=None, stop_event=None):
+    cam_capture = DualCameraCapture(left_cam_id=2, right_cam_id=1, preview_size=STEREO_IMAGE_SIZE)
+    stereo_vision = StereoVision(cam_capture, calibration=calibration, stop_event=stop_event, heartbeat=heartbeat)
+    if stream_address is not None:
+        # Mode sans affichage : la profondeur est diffusée aux clients locaux
+        stereo_vision.run_headless(DepthStreamServer(stream_address).start())
+        return None, None
     stereo_vision.process_and_display()
 
     disparity_normalized = stereo_vision.disparity_normalized
@@ -62,53 +72,11 @@ def run_stereo_vision():
     return disparity_normalized, depth
 
 
-def terminate_processes(processes):
-    """ Termine les processus donnés. """
-    for proc in processes:
-        if proc.is_alive():
-            proc.terminate()
-            proc.join()
-
-
-def kill_zombie_processes():
-    """Termine les processus zombies."""
-    for proc in psutil.process_iter(['pid', 'status']):
-        try:
-            if proc.info['status'] == psutil.STATUS_ZOMBIE:
-                print(f"Processus zombie détecté : PID {proc.info['pid']}")
-                os.kill(proc.info['pid'], signal.SIGKILL)
-                print(f"Processus zombie {proc.info['pid']} tué.")
-        except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
-            print(f"Erreur en traitant le processus {proc.info['pid']}: {e}")
-
-
-def clean_temp_dirs(directories):
-    """Nettoie les répertoires temporaires spécifiés."""
-    for directory in directories:
-        try:
-            for filename in os.listdir(directory):
-                file_path = os.path.join(directory, filename)
-                try:
-                    if os.path.isfile(file_path) or os.path.islink(file_path):
-                        os.unlink(file_path)
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path)
-                except Exception as e:
-                    print(f"Erreur en nettoyant {file_path}: {e}")
-        except Exception as e:
-            print(f"Erreur en nettoyant {directory}: {e}")
-
-
-def cleanup():
-    """Effectue les opérations de nettoyage."""
-    kill_zombie_processes()
-    clean_temp_dirs(['/tmp', '/var/tmp'])
-    print("Mémoire libérée.")
-    print("Nettoyage du système terminé.")
+def run_multi_rig(multi_rig, display=False, heartbeat=None, stop_event=None):
+    multi_rig.run(heartbeat=heartbeat, stop_event=stop_event, display=display)
 
 
 if __name__ == "__main__":
-    cleanup()
     folder_create('data')
     folder_create('image')
     folder_create('corner')
@@ -124,29 +92,30 @@ if __name__ == "__main__":
         print("Choix invalide. Veuillez entrer 'y' ou 'n'.")
         exit(1)
 
+    headless = input("Voulez-vous diffuser la profondeur sans affichage (y/n) ? ").strip().lower() == "y"
+    tof_address = TOF_STREAM_ADDRESS if headless else None
+    stereo_address = STEREO_STREAM_ADDRESS if headless else None
+
+    # Supervision des processus : redémarrage automatique en cas de plantage, arrêt propre par CTRL+C
+    supervisor = ProcessSupervisor()
     # Initialisation des queues pour la communication entre processus
     camera_queue = multiprocessing.Queue()
+    supervisor.add("ToF", run_tof_camera, args=(camera_queue, tof_address))
 
-    # Création des processus
-    tof_process = multiprocessing.Process(target=run_tof_camera, args=(camera_queue,))
-    stereo_process = multiprocessing.Process(target=run_stereo_vision)
-
-    # Démarrage des processus
-    tof_process.start()
-    stereo_process.start()
-
-    processes = [tof_process, stereo_process]
-
-    # Attente de la fin des processus
-    try:
-        # Maintenir les processus en vie
-        while True:
-            sleep(1)
-    except KeyboardInterrupt:
-        print("Interruption détectée. Arrêt des processus...")
-    finally:
-        # Arrêt des processus
-        terminate_processes(processes)
-        print("Tous les processus ont été arrêtés.")
-        cleanup()
-        sys.exit(0)
+    if os.path.exists(RIGS_CONFIG):
+        # Plusieurs paires stéréo : calibrations et cartes préchargées pour toutes les paires avant le fork
+        multi_rig = MultiRig.from_config(RIGS_CONFIG, stream=headless)
+        supervisor.add("Vision stéréo multiple", run_multi_rig, args=(multi_rig, not headless))
+    else:
+        # Préchargement de la calibration et des cartes de remappage : les processus créés par fork les
+        # partagent, un processus redémarré n'a donc pas à les relire. Les cartes sont construites pour la
+        # résolution de la vision stéréo (et enregistrées dans data/maps pour les lancements suivants)
+        calibration = StereoCalibration(map_cache_dir='data/maps')
+        calibration.load_data('data')
+        if calibration.image_size is not None:
+            calibration.rectification_maps(STEREO_IMAGE_SIZE)
+        supervisor.add("Vision stéréo", run_stereo_vision, args=(stereo_address, calibration))
+
+    supervisor.run()
+    print("Tous les processus ont été arrêtés.")
+    sys.exit(0)
@@ -0,0 +1,191 @@
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import cv2
+from calibration_camera import StereoCalibration
+from camera_control import DualCameraCapture
+from stereo_vision import StereoVision
+from depth_stream import DepthStreamServer
+
+#: Résolution de capture utilisée si la configuration n'en donne pas
+DEFAULT_IMAGE_SIZE = (800, 600)
+#: Période d'affichage des cadences par paire, en secondes
+REPORT_INTERVAL = 10.0
+
+
+class Rig:
+    def __init__(self, name, left_cam_id, right_cam_id, calibration_dir, image_size=DEFAULT_IMAGE_SIZE,
+                 stream_address=None, options=None):
+        """
+        Initialise une paire stéréo du multiplexeur de caméras avec sa propre calibration.
+
+        La calibration est chargée et les cartes de rectification sont construites (ou relues dans
+        calibration_dir/maps) dès la création, avant le démarrage des processus.
+
+        :param name: Nom de la paire (affiché dans le journal et indiqué dans les métadonnées diffusées)
+        :param left_cam_id: ID de la caméra gauche
+        :param right_cam_id: ID de la caméra droite
+        :param calibration_dir: Dossier des données de calibration de la paire
+        :param image_size: Résolution de capture (largeur, hauteur)
+        :param stream_address: Adresse de diffusion de la profondeur (None : pas de diffusion)
+        :param options: Paramètres supplémentaires de StereoVision (moteur, sgbm_config, target_fps...)
+        """
+        self.name = name
+        self.stream_address = stream_address
+        self.server = None
+        self.frames = 0  # Nombre d'images calculées
+        self.busy_time = 0.0  # Temps de calcul cumulé en secondes
+
+        calibration = StereoCalibration(map_cache_dir=os.path.join(calibration_dir, 'maps'))
+        calibration.load_data(calibration_dir)
+        if calibration.image_size is not None:
+            calibration.rectification_maps(tuple(image_size))
+        cam_capture = DualCameraCapture(left_cam_id=left_cam_id, right_cam_id=right_cam_id,
+                                        preview_size=tuple(image_size))
+        self.vision = StereoVision(cam_capture, calibration=calibration, **(options or {}))
+
+    def start(self):
+        """
+        Démarre le serveur de diffusion de la paire (dans le processus qui calcule la profondeur).
+        """
+        if self.stream_address is not None:
+            self.server = DepthStreamServer(self.stream_address).start()
+
+    def step(self):
+        """
+        Capture une paire d'images, calcule la profondeur et la publie.
+
+        Une seule image d'une paire est calculée à la fois : les tampons de la paire ne sont réécrits qu'à
+        l'appel suivant.
+
+        :return: Instance de Rig (pour le planificateur)
+        """
+        start = time.perf_counter()
+        self.vision.compute_frame()
+        self.frames += 1
+        if self.server is not None:
+            self.vision.publish_frame(self.server, self.frames, source=f"stereo:{self.name}")
+        self.busy_time += time.perf_counter() - start
+        return self
+
+    def close(self):
+        """
+        Ferme le serveur de diffusion et les caméras de la paire.
+        """
+        if self.server is not None:
+            self.server.close()
+            self.server = None
+        self.vision.cam_capture.close_cameras()
+
+
+class MultiRig:
+    def __init__(self, rigs, workers=None):
+        """
+        Initialise le calcul de plusieurs paires stéréo sur une réserve de fils d'exécution partagée.
+
+        Capture, rectification et mise en correspondance d'OpenCV libèrent le GIL : les paires sont calculées en
+        parallèle dans un seul processus. L'ordonnancement est équitable (tourniquet) : une paire dont l'image
+        est terminée repasse en fin de file, et chaque paire n'a qu'une image en cours à la fois, de sorte
+        qu'une paire lente ne prive pas les autres de fils d'exécution.
+
+        :param rigs: Liste d'instances de Rig
+        :param workers: Nombre de fils d'exécution (par défaut le nombre de paires, limité au nombre de cœurs)
+        """
+        if not rigs:
+            raise ValueError("Aucune paire stéréo configurée.")
+        self.rigs = rigs
+        self.workers = workers or min(len(rigs), os.cpu_count() or 1)
+
+    @classmethod
+    def from_config(cls, filename, stream=True, workers=None):
+        """
+        Crée les paires stéréo décrites dans un fichier JSON.
+
+        Format : {"image_size": [800, 600], "workers": 2, "rigs": [{"name": "avant", "left": 2, "right": 1,
+        "calibration": "data/avant", "stream_port": 5601, "options": {"engine": "sgbm"}}, ...]}. Seuls
+        "left", "right" et "calibration" sont obligatoires pour chaque paire.
+
+        :param filename: Chemin du fichier JSON
+        :param stream: Si False, la profondeur n'est pas diffusée (ports ignorés)
+        :param workers: Nombre de fils d'exécution (remplace la valeur du fichier)
+        :return: Instance de MultiRig
+        """
+        with open(filename) as f:
+            config = json.load(f)
+        image_size = config.get("image_size", DEFAULT_IMAGE_SIZE)
+        rigs = []
+        for i, entry in enumerate(config.get("rigs", [])):
+            port = entry.get("stream_port")
+            address = ('127.0.0.1', port) if stream and port is not None else None
+            rigs.append(Rig(entry.get("name", f"paire{i}"), entry["left"], entry["right"], entry["calibration"],
+                            entry.get("image_size", image_size), address, entry.get("options")))
+        return cls(rigs, workers or config.get("workers"))
+
+    def _report(self, elapsed):
+        """Affiche la cadence de chaque paire et la cadence totale."""
+        rates = ", ".join(f"{rig.name} {rig.frames / elapsed:.1f}" for rig in self.rigs)
+        total = sum(rig.frames for rig in self.rigs) / elapsed
+        print(f"Vision stéréo multiple : {total:.1f} img/s ({rates})")
+
+    def run(self, heartbeat=None, stop_event=None, display=False):
+        """
+        Calcule la profondeur de toutes les paires en continu.
+
+        :param heartbeat: Battement de cœur signalé à chaque image terminée au superviseur (facultatif)
+        :param stop_event: Événement d'arrêt (facultatif, sinon arrêt par CTRL+C ou 'q' avec l'affichage)
+        :param display: Affiche la carte colorisée de chaque paire
+        """
+        # Le parallélisme vient des paires : les cœurs restants sont laissés aux fonctions d'OpenCV
+        cv2.setNumThreads(max(1, (os.cpu_count() or 1) // self.workers))
+        for rig in self.rigs:
+            rig.start()
+        ready = deque(self.rigs)  # Paires en attente d'un fil d'exécution, dans l'ordre d'arrivée
+        pending = {}
+        start = last_report = time.monotonic()
+        executor = ThreadPoolExecutor(self.workers, thread_name_prefix="rig")
+        try:
+            while stop_event is None or not stop_event.is_set():
+                while ready and len(pending) < self.workers:
+                    rig = ready.popleft()
+                    pending[executor.submit(rig.step)] = rig
+                done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del pending[future]
+                    rig = future.result()  # Propage une erreur de calcul (le superviseur relance le processus)
+                    if display:
+                        cv2.imshow(f"disparity {rig.name}", rig.vision.disparity_color)
+                    ready.append(rig)
+                if done and heartbeat is not None:
+                    heartbeat.beat()
+                if display and cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+                now = time.monotonic()
+                if now - last_report >= REPORT_INTERVAL:
+                    self._report(now - start)
+                    last_report = now
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # Les images en cours sont terminées avant de fermer les caméras
+            executor.shutdown(wait=True)
+            for rig in self.rigs:
+                rig.close()
+            if display:
+                cv2.destroyAllWindows()
+            self._report(max(time.monotonic() - start, 1e-6))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vision stéréo sur plusieurs paires de caméras")
+    parser.add_argument("config", help="Fichier JSON décrivant les paires stéréo")
+    parser.add_argument("--workers", type=int, help="Nombre de fils d'exécution (par défaut un par paire)")
+    parser.add_argument("--display", action="store_true", help="Affiche la carte colorisée de chaque paire")
+    parser.add_argument("--no-stream", action="store_true", help="Ne diffuse pas la profondeur")
+    args = parser.parse_args()
+
+    MultiRig.from_config(args.config, stream=not args.no_stream, workers=args.workers).run(display=args.display)
+    sys.exit(0)
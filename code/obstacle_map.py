@@ -0,0 +1,119 @@
+import numpy as np
+from buffer_pool import BufferPool
+
+
+class ObstacleMap:
+    def __init__(self, focale, band=(0.4, 0.6), max_distance=5.0, cell_size=0.1, grid_width=4.0, row_step=2,
+                 min_points=3):
+        """
+        Initialise la réduction d'une carte de profondeur en informations de navigation : distance de l'obstacle
+        le plus proche pour chaque colonne de l'image et grille d'occupation vue de dessus.
+
+        Le calcul n'utilise que quelques réductions NumPy sur une bande horizontale de l'image (pas de contours),
+        dans des tableaux réutilisés d'une image à l'autre.
+
+        :param focale: Focale de la caméra en pixels (à la résolution de la carte de profondeur)
+        :param band: Bande de hauteur analysée, en fractions de la hauteur de l'image (haut, bas)
+        :param max_distance: Profondeur maximale prise en compte dans la grille, en mètres
+        :param cell_size: Taille d'une cellule de la grille en mètres
+        :param grid_width: Largeur couverte par la grille en mètres, centrée sur l'axe de la caméra
+        :param row_step: Pas d'échantillonnage des lignes de la bande pour la grille d'occupation
+        :param min_points: Nombre minimal de points dans une cellule pour la considérer occupée
+        """
+        self.focale = focale
+        self.band = band
+        self.max_distance = max_distance
+        self.cell_size = cell_size
+        self.row_step = row_step
+        self.min_points = min_points
+        #: Taille de la grille (lignes en profondeur, colonnes latérales) ; la ligne 0 est la plus éloignée
+        self.grid_shape = (int(np.ceil(max_distance / cell_size)), int(np.ceil(grid_width / cell_size)))
+        self.pool = BufferPool()
+        self._lateral = None  # Abscisse latérale par mètre de profondeur de chaque colonne
+        self.nearest = None  # Distance de l'obstacle le plus proche par colonne (0 si aucun)
+        self.grid = None  # Grille d'occupation (255 : occupée)
+
+    def _band(self, depth):
+        """Retourne la bande de lignes analysée (vue sur la carte de profondeur)."""
+        height = depth.shape[0]
+        top = int(self.band[0] * height)
+        bottom = max(int(self.band[1] * height), top + 1)
+        return depth[top:bottom]
+
+    def nearest_per_column(self, depth):
+        """
+        Calcule la distance de l'obstacle valide le plus proche dans chaque colonne de la bande.
+
+        :param depth: Profondeur en mètres (float32, 0 pour les pixels invalides)
+        :return: Distance par colonne en mètres (float32, 0 si la colonne ne contient aucun pixel valide)
+        """
+        band = self._band(np.ascontiguousarray(depth, np.float32))
+        # Les flottants positifs sont ordonnés comme leur représentation binaire : en retirant 1 à celle-ci
+        # (entiers non signés), les zéros (invalides) deviennent la plus grande valeur et sont ignorés par le
+        # minimum, sans masque ni copie de la bande
+        bits = np.subtract(band.view(np.uint32), np.uint32(1), out=self.pool.get("bits", band.shape, np.uint32))
+        nearest = np.min(bits, axis=0, out=self.pool.get("nearest_bits", band.shape[1:], np.uint32))
+        np.add(nearest, np.uint32(1), out=nearest)
+        self.nearest = nearest.view(np.float32)
+        return self.nearest
+
+    def occupancy(self, depth):
+        """
+        Projette les points de la bande sur une grille vue de dessus et marque les cellules occupées.
+
+        :param depth: Profondeur en mètres (float32, 0 pour les pixels invalides)
+        :return: Grille d'occupation (uint8, 255 pour une cellule occupée), ligne 0 la plus éloignée, colonne
+                 centrale sur l'axe de la caméra
+        """
+        pool = self.pool
+        rows, columns = self.grid_shape
+        sample = self._band(np.asarray(depth, np.float32))[::self.row_step]
+        shape = sample.shape
+        width = depth.shape[1]
+
+        # Abscisse latérale de chaque colonne par mètre de profondeur : (x - cx) / f, calculée une fois par largeur
+        if self._lateral is None or self._lateral.shape[0] != width:
+            self._lateral = ((np.arange(width) - (width - 1) / 2) / self.focale).astype(np.float32)
+        lateral = self._lateral
+
+        # Coordonnées de cellule (flottantes) : profondeur et position latérale
+        forward = np.multiply(sample, 1.0 / self.cell_size, out=pool.get("forward", shape, np.float32))
+        side = np.multiply(sample, lateral, out=pool.get("side", shape, np.float32))
+        np.multiply(side, 1.0 / self.cell_size, out=side)
+        np.add(side, columns / 2, out=side)
+
+        # Points hors de la grille ou invalides
+        outside = np.less_equal(forward, 0, out=pool.get("outside", shape, bool))
+        test = pool.get("test", shape, bool)
+        for values, comparison, limit in ((forward, np.greater_equal, rows), (side, np.less, 0),
+                                          (side, np.greater_equal, columns)):
+            np.logical_or(outside, comparison(values, limit, out=test), out=outside)
+
+        # Indice de cellule (la ligne 0 étant la plus éloignée) ; les points hors grille vont dans une case
+        # supplémentaire ignorée
+        np.floor(forward, out=forward)
+        np.subtract(rows - 1, forward, out=forward)
+        np.floor(side, out=side)
+        np.multiply(forward, columns, out=forward)
+        np.add(forward, side, out=forward)
+        np.copyto(forward, rows * columns, where=outside)
+        index = pool.get("index", shape, np.intp)
+        np.copyto(index, forward, casting='unsafe')
+
+        counts = np.bincount(index.reshape(-1), minlength=rows * columns + 1)[:rows * columns]
+        grid = pool.get("grid", self.grid_shape, np.uint8)
+        np.greater_equal(counts.reshape(self.grid_shape), self.min_points, out=grid, casting='unsafe')
+        np.multiply(grid, 255, out=grid)
+        self.grid = grid
+        return grid
+
+    def update(self, depth):
+        """
+        Calcule la distance par colonne et la grille d'occupation d'une image.
+
+        Les tableaux retournés sont réutilisés à l'image suivante.
+
+        :param depth: Profondeur en mètres (float32, 0 pour les pixels invalides)
+        :return: Tuple (distance par colonne, grille d'occupation)
+        """
+        return self.nearest_per_column(depth), self.occupancy(depth)
@@ -0,0 +1,120 @@
+import time
+
+
+class QualityController:
+    def __init__(self, levels, target_fps, apply, start_level=0, smoothing=0.2, degrade_margin=1.1,
+                 upgrade_margin=0.7, patience=5, upgrade_patience=30, name="qualité"):
+        """
+        Initialise le régulateur de qualité qui maintient une cadence cible.
+
+        Le régulateur lisse la latence mesurée à chaque image (moyenne glissante exponentielle). Si elle dépasse
+        le budget pendant `patience` images, il passe au niveau de qualité suivant (moins coûteux) ; si elle
+        reste nettement sous le budget pendant `upgrade_patience` images, il remonte d'un niveau. L'écart entre
+        les deux seuils et les deux délais évite les oscillations.
+
+        :param levels: Liste des niveaux de qualité (dictionnaires de paramètres), du plus coûteux au moins coûteux
+        :param target_fps: Cadence visée en images par seconde
+        :param apply: Fonction appelée avec le dictionnaire du niveau choisi à chaque changement
+        :param start_level: Indice du niveau de départ
+        :param smoothing: Poids de la dernière mesure dans la moyenne glissante
+        :param degrade_margin: Baisse de qualité quand la latence dépasse budget * degrade_margin
+        :param upgrade_margin: Hausse de qualité quand la latence est sous budget * upgrade_margin
+        :param patience: Nombre d'images consécutives hors budget avant une baisse de qualité
+        :param upgrade_patience: Nombre d'images consécutives avec de la marge avant une hausse de qualité
+        :param name: Nom affiché dans le journal des décisions
+        """
+        if not levels:
+            raise ValueError("Au moins un niveau de qualité est nécessaire")
+        self.levels = levels
+        self.budget = 1.0 / target_fps
+        self.apply = apply
+        self.level = min(max(start_level, 0), len(levels) - 1)
+        self.smoothing = smoothing
+        self.degrade_margin = degrade_margin
+        self.upgrade_margin = upgrade_margin
+        self.patience = patience
+        self.upgrade_patience = upgrade_patience
+        self.name = name
+        self.latency = None  # Latence lissée en secondes
+        self.over_budget = 0  # Nombre d'images consécutives au-dessus du budget
+        self.under_budget = 0  # Nombre d'images consécutives avec de la marge
+        self.apply(self.levels[self.level])
+
+    def update(self, latency):
+        """
+        Prend en compte la latence d'une image et change de niveau si nécessaire.
+
+        :param latency: Latence de la dernière image en secondes
+        :return: Nouvel indice de niveau s'il a changé, sinon None
+        """
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+
+        if self.latency > self.budget * self.degrade_margin:
+            self.over_budget += 1
+            self.under_budget = 0
+        elif self.latency < self.budget * self.upgrade_margin:
+            self.under_budget += 1
+            self.over_budget = 0
+        else:
+            self.over_budget = 0
+            self.under_budget = 0
+
+        if self.over_budget >= self.patience and self.level < len(self.levels) - 1:
+            return self._change(self.level + 1, "baisse")
+        if self.under_budget >= self.upgrade_patience and self.level > 0:
+            return self._change(self.level - 1, "hausse")
+        return None
+
+    def _change(self, level, direction):
+        """Applique un nouveau niveau et journalise la décision."""
+        print(f"[{time.strftime('%H:%M:%S')}] {self.name} : {direction} vers le niveau {level} "
+              f"{self.levels[level]} (latence {1000 * self.latency:.1f} ms, budget {1000 * self.budget:.1f} ms)")
+        self.level = level
+        self.over_budget = 0
+        self.under_budget = 0
+        # La latence mesurée au niveau précédent n'est plus représentative
+        self.latency = None
+        self.apply(self.levels[level])
+        return level
+
+
+def stereo_levels(num_disp_bounds=(64, 128), block_size_bounds=(5, 15), scales=(1.0, 0.75, 0.5), num_disp_step=32):
+    """
+    Construit les niveaux de qualité de la vision stéréo, du plus coûteux au moins coûteux.
+
+    Pour chaque résolution de traitement, la plage de disparité est réduite par pas de num_disp_step ; la taille
+    de bloc suit la résolution pour garder la même fenêtre dans la scène. Les bornes et le pas sont ramenés à des
+    multiples de 16, seules valeurs acceptées par les moteurs d'OpenCV.
+
+    :param num_disp_bounds: Plage de disparité (min, max) en pixels pleine résolution
+    :param block_size_bounds: Taille de bloc (min, max)
+    :param scales: Facteurs de résolution de traitement, décroissants
+    :param num_disp_step: Pas de réduction de la plage de disparité
+    :return: Liste de dictionnaires (scale, num_disp, block_size)
+    """
+    min_block, max_block = block_size_bounds
+    max_num_disp = max(16, num_disp_bounds[1] // 16 * 16)
+    min_num_disp = min(max(16, -(-num_disp_bounds[0] // 16) * 16), max_num_disp)
+    num_disp_step = max(16, num_disp_step // 16 * 16)
+    levels = []
+    for scale in scales:
+        block_size = int(round(max_block * scale)) | 1  # Taille de bloc impaire
+        block_size = min(max(block_size, min_block | 1), max_block)
+        num_disp = max_num_disp
+        while num_disp >= min_num_disp:
+            levels.append({"scale": scale, "num_disp": num_disp, "block_size": block_size})
+            num_disp -= num_disp_step
+    return levels
+
+
+def tof_levels(max_skip=3):
+    """
+    Construit les niveaux de qualité de la caméra ToF : nombre de trames ignorées entre deux traitements.
+
+    :param max_skip: Nombre maximal de trames ignorées
+    :return: Liste de dictionnaires (frame_skip)
+    """
+    return [{"frame_skip": skip} for skip in range(max_skip + 1)]
@@ -0,0 +1,103 @@
+import cv2
+import numpy as np
+from buffer_pool import BufferPool
+
+
+class DepthIntegral:
+    def __init__(self):
+        """
+        Initialise les requêtes de profondeur par zone rectangulaire, à partir des images intégrales (tables de
+        sommes cumulées) de la profondeur, de son carré et du nombre de pixels valides.
+
+        Les images intégrales sont calculées une fois par image, au premier appel de query ou query_many qui suit
+        update ; chaque requête ne lit ensuite que quatre valeurs par table, quelle que soit la taille de la
+        zone. Une image sans requête ne coûte donc rien.
+        """
+        self.pool = BufferPool()
+        self.depth = None  # Carte de profondeur de l'image courante
+        self.shape = None  # Taille (hauteur, largeur) de la carte de profondeur
+        self.sum = None  # Image intégrale de la profondeur
+        self.sqsum = None  # Image intégrale du carré de la profondeur
+        self.count = None  # Image intégrale du nombre de pixels valides
+        self._dirty = False  # Images intégrales à recalculer
+
+    def update(self, depth):
+        """
+        Associe la carte de profondeur d'une nouvelle image.
+
+        La carte n'est pas copiée : les requêtes doivent être faites avant qu'elle soit réécrite par l'image
+        suivante.
+
+        :param depth: Profondeur en mètres (float32, 0 pour les pixels invalides)
+        """
+        self.depth = depth
+        self.shape = depth.shape[:2]
+        self._dirty = True
+
+    def _compute(self):
+        """Calcule les images intégrales de l'image courante (dans des tableaux réutilisés)."""
+        pool = self.pool
+        height, width = self.shape
+        depth = np.ascontiguousarray(self.depth, np.float32)
+        size = (height + 1, width + 1)
+        self.sum = pool.get("sum", size, np.float64)
+        self.sqsum = pool.get("sqsum", size, np.float64)
+        cv2.integral2(depth, self.sum, self.sqsum, cv2.CV_64F, cv2.CV_64F)
+        valid = np.greater(depth, 0, out=pool.get("valid", self.shape, np.uint8), casting='unsafe')
+        self.count = pool.get("count", size, np.int32)
+        cv2.integral(valid, self.count, cv2.CV_32S)
+        self._dirty = False
+
+    def _clip(self, x0, y0, x1, y1):
+        """Limite les coordonnées des rectangles à l'image."""
+        height, width = self.shape
+        return (np.clip(x0, 0, width), np.clip(y0, 0, height), np.clip(x1, 0, width), np.clip(y1, 0, height))
+
+    def query_many(self, rects):
+        """
+        Calcule la profondeur moyenne, sa variance et la proportion de pixels valides de plusieurs zones.
+
+        :param rects: Tableau (N, 4) de rectangles (x0, y0, x1, y1) en pixels, bornes x1 et y1 exclues ; les
+                      rectangles sont limités à l'image
+        :return: Tuple de tableaux (moyenne en mètres, variance en m², couverture entre 0 et 1) de taille N ;
+                 moyenne et variance valent 0 pour une zone sans pixel valide
+        """
+        if self.depth is None:
+            raise ValueError("Aucune carte de profondeur : appeler update avant les requêtes.")
+        if self._dirty:
+            self._compute()
+        rects = np.asarray(rects, np.intp).reshape(-1, 4)
+        x0, y0, x1, y1 = self._clip(*rects.T)
+        x1 = np.maximum(x1, x0)
+        y1 = np.maximum(y1, y0)
+
+        def area_sum(table):
+            return table[y1, x1] - table[y0, x1] - table[y1, x0] + table[y0, x0]
+
+        count = area_sum(self.count)
+        total = area_sum(self.sum)
+        squares = area_sum(self.sqsum)
+        valid = np.maximum(count, 1)
+        mean = total / valid
+        # Var = E[d²] - E[d]², bornée à 0 contre les erreurs d'arrondi
+        variance = np.maximum(squares / valid - mean * mean, 0)
+        # Résidus d'arrondi des sommes cumulées dans les zones sans pixel valide
+        empty = count == 0
+        np.copyto(mean, 0, where=empty)
+        np.copyto(variance, 0, where=empty)
+        area = (x1 - x0) * (y1 - y0)
+        coverage = count / np.maximum(area, 1)
+        return mean, variance, coverage
+
+    def query(self, x0, y0, x1, y1):
+        """
+        Calcule la profondeur moyenne, sa variance et la proportion de pixels valides d'une zone rectangulaire.
+
+        :param x0: Abscisse du bord gauche en pixels (incluse)
+        :param y0: Ordonnée du bord haut en pixels (incluse)
+        :param x1: Abscisse du bord droit en pixels (exclue)
+        :param y1: Ordonnée du bord bas en pixels (exclue)
+        :return: Tuple (moyenne en mètres, variance en m², couverture entre 0 et 1)
+        """
+        mean, variance, coverage = self.query_many(((x0, y0, x1, y1),))
+        return float(mean[0]), float(variance[0]), float(coverage[0])
@@ -0,0 +1,335 @@
+import os
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+from disparity_engines import ENGINES, MatcherParameters, create_engine
+
+# Espace de recherche par défaut : P1 et P2 sont exprimés en multiples de block_size², comme le recommande OpenCV
+DEFAULT_SPACE = {
+    "engine": ["sgbm"],
+    "block_size": [3, 5, 7, 9, 11, 15],
+    "P1_factor": [2, 4, 8],
+    "P2_ratio": [2, 4, 8],
+    "num_disp": [32, 64, 96, 128, 144],
+    "uniqueRatio": [0, 4, 10],
+    "speckleWindowSize": [0, 50, 100, 200],
+    "speckleRange": [1, 2, 4],
+    "disp12MaxDiff": [-1, 0, 2],
+}
+
+
+def synthetic_pair(size=(800, 600), layers=4, max_disp=96, seed=0):
+    """
+    Génère une paire stéréo synthétique rectifiée et sa vérité terrain.
+
+    La scène est une texture aléatoire découpée en bandes verticales placées à des profondeurs différentes ;
+    l'image droite est obtenue en décalant l'image gauche de la disparité de chaque bande.
+
+    :param size: Taille des images (largeur, hauteur)
+    :param layers: Nombre de plans de profondeur
+    :param max_disp: Disparité maximale de la scène
+    :param seed: Graine du générateur aléatoire
+    :return: Tuple (image gauche, image droite, disparité vraie de l'image gauche en float32)
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    noise = rng.integers(0, 256, (height, width + max_disp), dtype=np.uint8)
+    texture = cv2.GaussianBlur(noise, (3, 3), 0)
+
+    ground_truth = np.empty((height, width), np.float32)
+    bounds = np.linspace(0, width, layers + 1).astype(int)
+    for i in range(layers):
+        ground_truth[:, bounds[i]:bounds[i + 1]] = rng.uniform(max_disp * 0.1, max_disp * 0.9)
+
+    # Le point vu en x dans l'image gauche apparaît en x - d dans l'image droite : la droite échantillonne donc
+    # la texture en x + d (disparité approchée par celle du pixel gauche de même abscisse)
+    left = texture[:, max_disp:max_disp + width].copy()
+    map_x = (np.arange(width, dtype=np.float32)[None, :] + max_disp + ground_truth).astype(np.float32)
+    map_y = np.repeat(np.arange(height, dtype=np.float32)[:, None], width, axis=1)
+    right = cv2.remap(texture, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+    return left, right, ground_truth
+
+
+def load_pairs(image_folder, calibration=None):
+    """
+    Charge les paires enregistrées leftNN / rightNN (jpg ou png) d'un dossier.
+
+    Les vérités terrain facultatives sont lues dans les fichiers dispNN.npy du même dossier.
+
+    :param image_folder: Dossier contenant les paires
+    :param calibration: Instance de StereoCalibration pour rectifier les images (facultatif)
+    :return: Tuple (liste des paires (gauche, droite), liste des vérités terrain ou None)
+    """
+    pairs, ground_truths = [], []
+    counter = 1
+    while True:
+        names = [None, None]
+        for i, side in enumerate(("left", "right")):
+            for extension in ('.jpg', '.png'):
+                name = image_folder + '/' + side + str(counter).zfill(2) + extension
+                if os.path.isfile(name):
+                    names[i] = name
+        if names[0] is None or names[1] is None:
+            break
+        pair = [cv2.imread(name, 0) for name in names]
+        if calibration is not None:
+            pair = calibration.rectify(pair)
+        pairs.append(tuple(pair))
+        gt_name = image_folder + '/disp' + str(counter).zfill(2) + '.npy'
+        ground_truths.append(np.load(gt_name) if os.path.isfile(gt_name) else None)
+        counter += 1
+    return pairs, ground_truths
+
+
+class SGBMTuner:
+    def __init__(self, pairs, ground_truths=None, target_fps=5.0, min_disp=0, repeats=3):
+        """
+        Initialise le réglage automatique des paramètres de StereoSGBM.
+
+        :param pairs: Liste des paires rectifiées (gauche, droite) en niveaux de gris
+        :param ground_truths: Liste des disparités vraies (ou None pour une paire sans vérité terrain)
+        :param target_fps: Cadence visée, qui fixe le budget de latence par image
+        :param min_disp: Disparité minimale utilisée pour toutes les configurations
+        :param repeats: Nombre de mesures de latence par paire (la médiane est retenue)
+        """
+        self.pairs = pairs
+        self.ground_truths = ground_truths if ground_truths is not None else [None] * len(pairs)
+        self.target_fps = target_fps
+        self.min_disp = min_disp
+        self.repeats = repeats
+        self.results = []
+
+    def make_parameters(self, choice):
+        """
+        Convertit un point de l'espace de recherche en paramètres de StereoVision.
+
+        :param choice: Dictionnaire des valeurs choisies dans l'espace de recherche
+        :return: Dictionnaire des paramètres (mêmes noms que ceux de StereoVision)
+        """
+        block_size = choice["block_size"]
+        P1 = choice["P1_factor"] * block_size * block_size
+        return {
+            "engine": choice.get("engine", "sgbm"),
+            "block_size": block_size,
+            "P1": P1,
+            "P2": P1 * choice["P2_ratio"],
+            "min_disp": self.min_disp,
+            "max_disp": self.min_disp + choice["num_disp"],
+            "uniqueRatio": choice["uniqueRatio"],
+            "speckleWindowSize": choice["speckleWindowSize"],
+            "speckleRange": choice["speckleRange"],
+            "disp12MaxDiff": choice["disp12MaxDiff"],
+        }
+
+    def matcher_parameters(self, params):
+        """
+        Convertit les paramètres au format de StereoVision en paramètres communs des moteurs.
+
+        :param params: Paramètres au format de StereoVision
+        :return: Instance de MatcherParameters
+        """
+        return MatcherParameters(min_disp=params["min_disp"],
+                                 num_disp=params["max_disp"] - params["min_disp"],
+                                 block_size=params["block_size"],
+                                 P1=params["P1"],
+                                 P2=params["P2"],
+                                 uniqueRatio=params["uniqueRatio"],
+                                 speckleWindowSize=params["speckleWindowSize"],
+                                 speckleRange=params["speckleRange"],
+                                 disp12MaxDiff=params["disp12MaxDiff"])
+
+    def evaluate(self, params):
+        """
+        Mesure la latence et la qualité d'une configuration sur toutes les paires.
+
+        :param params: Paramètres au format de StereoVision
+        :return: Dictionnaire (params, latency en secondes, valid_ratio, depth_error ou None)
+        """
+        engine = create_engine(params.get("engine", "sgbm"))
+        matcher_params = self.matcher_parameters(params)
+        engine.compute(*self.pairs[0], matcher_params)  # Préchauffage (création du moteur, allocations d'OpenCV)
+
+        latencies, valid_ratios, errors = [], [], []
+        for (left, right), ground_truth in zip(self.pairs, self.ground_truths):
+            timings = []
+            for _ in range(self.repeats):
+                start = time.perf_counter()
+                disparity, valid = engine.compute(left, right, matcher_params)
+                timings.append(time.perf_counter() - start)
+            latencies.append(np.median(timings))
+
+            disparity = disparity.astype(np.float32) / 16.0
+            valid &= disparity > 0
+            valid_ratio = valid.mean()
+            valid_ratios.append(valid_ratio)
+            if ground_truth is not None:
+                # Erreur relative de profondeur : z = f.B / d, donc |z - z_vrai| / z_vrai = |d_vrai / d - 1|
+                mask = valid & (ground_truth > 0)
+                if mask.any():
+                    errors.append(np.mean(np.abs(ground_truth[mask] / disparity[mask] - 1)))
+
+        return {
+            "params": params,
+            "latency": float(np.mean(latencies)),
+            "valid_ratio": float(np.mean(valid_ratios)),
+            "depth_error": float(np.mean(errors)) if errors else None,
+        }
+
+    def search(self, space=None, trials=40, seed=0):
+        """
+        Explore aléatoirement l'espace des paramètres.
+
+        :param space: Espace de recherche (par défaut DEFAULT_SPACE)
+        :param trials: Nombre de configurations évaluées
+        :param seed: Graine du tirage aléatoire
+        :return: Liste des résultats de toutes les configurations évaluées
+        """
+        space = space or DEFAULT_SPACE
+        rng = np.random.default_rng(seed)
+        tried = set()
+        for trial in range(trials):
+            choice = {key: values[rng.integers(len(values))] for key, values in space.items()}
+            params = self.make_parameters(choice)
+            key = tuple(sorted(params.items()))
+            if key in tried:
+                continue
+            tried.add(key)
+            result = self.evaluate(params)
+            self.results.append(result)
+            print(f"Essai {trial + 1}/{trials} : {1000 * result['latency']:.1f} ms, "
+                  f"{100 * result['valid_ratio']:.1f} % valides, erreur {result['depth_error']}")
+        return self.results
+
+    def pareto_front(self, results=None):
+        """
+        Extrait le front de Pareto : latence minimale, proportion de pixels valides maximale et erreur de
+        profondeur minimale.
+
+        :param results: Résultats à filtrer (par défaut tous les résultats de search)
+        :return: Liste des résultats non dominés, triés par latence croissante
+        """
+        results = results if results is not None else self.results
+
+        def objectives(result):
+            error = result["depth_error"] if result["depth_error"] is not None else 0.0
+            return np.array([result["latency"], -result["valid_ratio"], error])
+
+        scores = [objectives(result) for result in results]
+        front = []
+        for i, score in enumerate(scores):
+            dominated = any(np.all(other <= score) and np.any(other < score)
+                            for j, other in enumerate(scores) if j != i)
+            if not dominated:
+                front.append(results[i])
+        return sorted(front, key=lambda result: result["latency"])
+
+    def choose(self, front=None):
+        """
+        Choisit la configuration du front qui respecte le budget de latence avec la meilleure qualité.
+
+        La qualité est la proportion de pixels valides, pondérée par (1 - erreur de profondeur) si une vérité
+        terrain est disponible, pour ne pas favoriser une carte exacte mais presque vide. Si aucune
+        configuration ne respecte le budget, la plus rapide est retenue.
+
+        :param front: Front de Pareto (par défaut celui des résultats de search)
+        :return: Résultat choisi
+        """
+        front = front if front is not None else self.pareto_front()
+        budget = 1.0 / self.target_fps
+        candidates = [result for result in front if result["latency"] <= budget]
+        if not candidates:
+            print(f"Aucune configuration ne tient {self.target_fps} images/s, la plus rapide est retenue")
+            return min(front, key=lambda result: result["latency"])
+
+        def quality(result):
+            error = result["depth_error"] if result["depth_error"] is not None else 0.0
+            return result["valid_ratio"] * (1.0 - min(error, 1.0))
+
+        return max(candidates, key=quality)
+
+
+def benchmark_engines(pairs, ground_truths=None, params=None, engines=None, target_fps=5.0):
+    """
+    Compare les moteurs de disparité enregistrés avec les mêmes paramètres.
+
+    :param pairs: Liste des paires rectifiées (gauche, droite) en niveaux de gris
+    :param ground_truths: Liste des disparités vraies (facultatif)
+    :param params: Paramètres au format de StereoVision (par défaut une configuration moyenne)
+    :param engines: Noms des moteurs à comparer (par défaut tous les moteurs de ENGINES)
+    :param target_fps: Cadence visée, utilisée seulement pour l'affichage
+    :return: Liste des résultats, un par moteur
+    """
+    tuner = SGBMTuner(pairs, ground_truths, target_fps=target_fps)
+    if params is None:
+        params = tuner.make_parameters({"block_size": 7, "P1_factor": 8, "P2_ratio": 4, "num_disp": 96,
+                                        "uniqueRatio": 4, "speckleWindowSize": 100, "speckleRange": 2,
+                                        "disp12MaxDiff": 1})
+    results = []
+    for name in engines or ENGINES:
+        result = tuner.evaluate(dict(params, engine=name))
+        results.append(result)
+        budget = "oui" if result["latency"] <= 1.0 / target_fps else "non"
+        print(f"{name:>10} : {1000 * result['latency']:.1f} ms, {100 * result['valid_ratio']:.1f} % valides, "
+              f"erreur {result['depth_error']}, tient {target_fps} images/s : {budget}")
+    return results
+
+
+def export_parameters(result, filename):
+    """
+    Enregistre une configuration au format JSON, lisible par StereoVision.load_parameters.
+
+    :param result: Résultat choisi (issu de SGBMTuner.choose)
+    :param filename: Chemin du fichier JSON
+    """
+    content = dict(result["params"])
+    content["_measures"] = {key: result[key] for key in ("latency", "valid_ratio", "depth_error")}
+    with open(filename, 'w') as f:
+        json.dump(content, f, indent=4)
+    print(f"Configuration enregistrée dans {filename}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Réglage automatique des paramètres de StereoSGBM")
+    parser.add_argument("--images", help="Dossier de paires enregistrées leftNN / rightNN")
+    parser.add_argument("--calibration", help="Dossier des données de calibration pour rectifier les paires")
+    parser.add_argument("--synthetic", type=int, default=0, help="Nombre de paires synthétiques à ajouter")
+    parser.add_argument("--size", type=int, nargs=2, default=(800, 600), help="Taille des paires synthétiques")
+    parser.add_argument("--target-fps", type=float, default=5.0, help="Cadence visée")
+    parser.add_argument("--trials", type=int, default=40, help="Nombre de configurations évaluées")
+    parser.add_argument("--output", default="data/sgbm.json", help="Fichier JSON de la configuration choisie")
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=None,
+                        help="Moteurs de disparité inclus (par défaut sgbm pour la recherche, "
+                             "tous les moteurs avec --benchmark)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare seulement les moteurs avec une configuration commune")
+    args = parser.parse_args()
+
+    pairs, ground_truths = [], []
+    if args.images:
+        calibration = None
+        if args.calibration:
+            from calibration_camera import StereoCalibration
+            calibration = StereoCalibration()
+            calibration.load_data(args.calibration)
+        pairs, ground_truths = load_pairs(args.images, calibration)
+    for seed in range(args.synthetic):
+        left, right, ground_truth = synthetic_pair(tuple(args.size), seed=seed)
+        pairs.append((left, right))
+        ground_truths.append(ground_truth)
+    if not pairs:
+        parser.error("Aucune paire : utiliser --images et/ou --synthetic")
+
+    if args.benchmark:
+        benchmark_engines(pairs, ground_truths, engines=args.engines, target_fps=args.target_fps)
+        raise SystemExit(0)
+
+    tuner = SGBMTuner(pairs, ground_truths, target_fps=args.target_fps)
+    tuner.search(space=dict(DEFAULT_SPACE, engine=args.engines or ["sgbm"]), trials=args.trials)
+    front = tuner.pareto_front()
+    print("Front de Pareto :")
+    for result in front:
+        print(f"  {1000 * result['latency']:.1f} ms, {100 * result['valid_ratio']:.1f} % valides, "
+              f"erreur {result['depth_error']} : {result['params']}")
+    export_parameters(tuner.choose(front), args.output)
@@ -1,10 +1,19 @@
+import json  # Importation pour la lecture des configurations exportées
+import time  # Importation pour la mesure de la latence par image
 import cv2  # Importation d'OpenCV pour le traitement d'images
 import numpy as np  # Importation de NumPy pour les opérations mathématiques et le traitement d'images
-from multiprocessing import Process, Queue, Event  # Importation des modules pour la gestion des processus
+import queue as queue_module  # Importation de l'exception de file vide
+from multiprocessing import Process, Queue, Event, parent_process  # Importation des modules pour la gestion des processus
 from calibration_camera import StereoCalibration  # Importation de la classe pour la calibration stéréo
-from exception import file_create  # Importation de la fonction pour la création de fichiers
-from camera_control import DualCameraCapture  # Importation de la classe pour le contrôle des caméras
+from file_writer import get_writer, close_writer  # Importation de l'écriture des fichiers en arrière-plan
 from depth_traitement import DepthMapProcessor  # Importation de la classe pour le traitement de la carte de profondeur
+from disparity_filter import DisparityHoleFiller  # Importation du remplissage des trous de disparité
+from disparity_engines import MatcherParameters, IncrementalEngine, create_engine  # Importation des moteurs de disparité
+from quality_controller import QualityController, stereo_levels  # Importation du régulateur de cadence
+from depth_lut import DepthColorizer  # Importation de la colorisation par table de correspondance
+from buffer_pool import BufferPool  # Importation de la réserve de tableaux réutilisés
+from obstacle_map import ObstacleMap  # Importation de la carte des obstacles pour la navigation
+from region_query import DepthIntegral  # Importation des requêtes de profondeur par zone
 
 # Importation de la fonction show_image
 from exception import show_image
@@ -13,7 +22,10 @@ from exception import show_image
 class StereoVision:
     def __init__(self, cam_capture, baseline=0.06, focale=1300, block_size=15, P1=10 * 15, P2=64, min_disp=-16,
                  max_disp=128,
-                 uniqueRatio=4, speckleWindowSize=200, speckleRange=4, disp12MaxDiff=0):
+                 uniqueRatio=4, speckleWindowSize=None, speckleRange=4, disp12MaxDiff=0, hole_filling=None,
+                 sgbm_config=None, target_fps=None, quality_levels=None, engine="sgbm",
+                 incremental=False, depth_thresholds=(0.5, 1.0, 2.0, 4.0), depth_range=(0.6, 5.0), calibration=None,
+                 stop_event=None, heartbeat=None):
         """
         Initialise les paramètres pour la vision stéréo.
 
@@ -26,23 +38,43 @@ class StereoVision:
         :param min_disp: Disparité minimale à considérer
         :param max_disp: Disparité maximale à considérer
         :param uniqueRatio: Ratio d'unicité pour la correspondance stéréo
-        :param speckleWindowSize: Taille de la fenêtre pour filtrer les speckles
+        :param speckleWindowSize: Taille de la fenêtre pour filtrer les speckles (par défaut 200, ou 50 avec le
+                                  remplissage des trous qui prend le relais d'une partie du filtrage)
         :param speckleRange: Plage de valeurs pour filtrer les speckles
         :param disp12MaxDiff: Différence maximale entre les disparités gauche et droite
+        :param hole_filling: Remplissage des pixels de disparité invalides : None, 'fast' ou 'guided'
+        :param sgbm_config: Fichier JSON de paramètres exporté par sgbm_tuner, qui remplace les valeurs ci-dessus
+        :param target_fps: Cadence visée ; si elle est donnée, la qualité est ajustée en continu pour la tenir
+        :param quality_levels: Niveaux de qualité du régulateur (par défaut construits par stereo_levels à partir
+                               de num_disp et block_size)
+        :param engine: Moteur de disparité : 'bm', 'sgbm', 'sgbm_3way' ou 'hh' (voir disparity_engines)
+        :param incremental: Si True, seules les zones modifiées depuis l'image précédente sont recalculées
+                            (caméras fixes, scène en grande partie statique)
+        :param depth_thresholds: Limites des bandes de profondeur en mètres utilisées pour la segmentation
+        :param depth_range: Profondeurs (proche, lointaine) en mètres des extrémités de l'échelle de couleurs
+        :param calibration: Instance de StereoCalibration déjà chargée (par défaut chargée depuis 'data')
+        :param stop_event: Événement d'arrêt partagé avec le superviseur (par défaut un nouvel événement)
+        :param heartbeat: Battement de cœur signalé à chaque image au superviseur (facultatif)
         """
         self.cam_capture = cam_capture  # Instance de la classe de capture de caméras
 
-        # Chargement des données de calibration stéréo
-        self.calibration = StereoCalibration()
-        self.calibration.load_data('data')
+        # Chargement des données de calibration stéréo (sauf si elles ont été préchargées)
+        if calibration is None:
+            calibration = StereoCalibration()
+            calibration.load_data('data')
+        self.calibration = calibration
         self.focale = focale  # Focale calculée pendant la calibration
         self.baseline = baseline  # Distance entre les caméras
 
+        # Tableaux réutilisés d'une image à l'autre (capture, rectification, disparité, profondeur, couleurs)
+        self.pool = BufferPool()
         # Dictionnaire pour stocker les images
         self.images = {"left": None, "right": None, "left_rectify": None, "right_rectify": None}
 
         self.disparity = None
-        self.disparity_normalized = None
+        self.disparity_normalized = None  # Disparité normalisée sur un canal (uint8)
+        self.disparity_color = None  # Carte colorisée à échelle fixe pour l'affichage
+        self.depth_labels = None  # Numéro de la bande de profondeur de chaque pixel
         self.depth = None
 
         # Paramètres pour les filtres de la caméra de profondeur
@@ -52,76 +84,213 @@ class StereoVision:
         self.num_disp = max_disp - min_disp
         self.P1 = P1
         self.P2 = P2
+        self._check_num_disp()
         self.uniquenessRatio = uniqueRatio
+        if speckleWindowSize is None:
+            speckleWindowSize = 200 if hole_filling is None else 50
         self.speckleWindowSize = speckleWindowSize
         self.speckleRange = speckleRange
         self.disp12MaxDiff = disp12MaxDiff
+        # Moteur de calcul de la disparité
+        self.incremental = incremental
+        self.engine = self.create_engine(engine)
+        # Remplissage des trous guidé par l'image gauche rectifiée
+        self.hole_filler = DisparityHoleFiller(hole_filling) if hole_filling else None
+        if sgbm_config is not None:
+            self.load_parameters(sgbm_config)
+        # Taille de bloc de référence des pénalités P1 et P2, mises à l'échelle quand la taille de bloc change
+        self.penalty_reference = (self.block_size, self.P1, self.P2)
+
+        # Résolution de traitement relative à celle des images rectifiées
+        self.processing_scale = 1.0
+        # Table de couleurs et de bandes de profondeur, construite une fois pour toute la plage de disparité
+        self.depth_thresholds = list(depth_thresholds)
+        self.colorizer = DepthColorizer.for_disparity(self.focale, self.baseline, self.max_disp,
+                                                      self.depth_thresholds, depth_range)
+        # Distance de l'obstacle le plus proche par colonne et grille d'occupation, calculées à chaque image
+        self.obstacle_map = ObstacleMap(self.focale)
+        self.obstacles = None
+        self.occupancy = None
+        # Requêtes de profondeur moyenne par zone rectangulaire sur l'image courante (self.regions.query)
+        self.regions = DepthIntegral()
+
+        # Régulateur de qualité pour maintenir la cadence visée
+        self.quality_controller = None
+        if target_fps is not None:
+            if quality_levels is None:
+                quality_levels = stereo_levels(num_disp_bounds=(min(64, self.num_disp), self.num_disp),
+                                               block_size_bounds=(5, self.block_size))
+            self.quality_controller = QualityController(quality_levels, target_fps, self.set_quality,
+                                                        name="Vision stéréo")
 
         # Événement pour arrêter les processus
-        self.stop_event = Event()
+        self.stop_event = stop_event if stop_event is not None else Event()
+        self.heartbeat = heartbeat
 
         self.n = 0  # Compteur pour le nombre d'images sauvegardées
 
-    def stereo_taking(self):
+    def load_parameters(self, filename):
         """
-        Capture et rectifie les images stéréo.
+        Charge les paramètres de StereoSGBM depuis un fichier JSON exporté par sgbm_tuner.
+
+        :param filename: Chemin du fichier JSON
+        """
+        try:
+            with open(filename) as f:
+                params = json.load(f)
+        except Exception as e:
+            print(f"Erreur lors du chargement des paramètres '{filename}': {e}")
+            return
+        attributes = {"block_size": "block_size", "P1": "P1", "P2": "P2", "min_disp": "min_disp",
+                      "max_disp": "max_disp", "uniqueRatio": "uniquenessRatio",
+                      "speckleWindowSize": "speckleWindowSize", "speckleRange": "speckleRange",
+                      "disp12MaxDiff": "disp12MaxDiff"}
+        for key, attribute in attributes.items():
+            if key in params:
+                setattr(self, attribute, params[key])
+        self.num_disp = self.max_disp - self.min_disp
+        self._check_num_disp()
+        self.penalty_reference = (self.block_size, self.P1, self.P2)
+        if "engine" in params:
+            self.engine = self.create_engine(params["engine"])
+        print(f"Paramètres chargés depuis {filename}")
+
+    def _check_num_disp(self):
+        """Arrondit le nombre de disparités au multiple de 16 supérieur, imposé par les moteurs d'OpenCV."""
+        num_disp = max(16, -(-self.num_disp // 16) * 16)
+        if num_disp != self.num_disp:
+            print(f"Nombre de disparités {self.num_disp} arrondi à {num_disp} (multiple de 16)")
+            self.num_disp = num_disp
+            self.max_disp = self.min_disp + num_disp
+
+    def create_engine(self, name):
         """
-        # Capture des images des caméras gauche et droite
-        self.cam_capture.capture_and_save_image(self.cam_capture.left_cam_id, 'left.png')
-        self.cam_capture.capture_and_save_image(self.cam_capture.right_cam_id, 'right.png')
+        Crée le moteur de disparité, enveloppé dans le moteur incrémental si celui-ci est activé.
 
-        # Lecture des images capturées en niveaux de gris
-        for side in ("left", "right"):
-            self.images[side] = cv2.imread(side + '.png', 0)
+        :param name: Nom du moteur de disparité
+        :return: Instance de DisparityEngine
+        """
+        engine = create_engine(name)
+        return IncrementalEngine(engine) if self.incremental else engine
+
+    def set_quality(self, level):
+        """
+        Applique un niveau de qualité (utilisé par le régulateur de cadence).
+
+        :param level: Dictionnaire pouvant contenir scale, num_disp et block_size
+        """
+        self.processing_scale = level.get("scale", self.processing_scale)
+        self.num_disp = level.get("num_disp", self.num_disp)
+        self.max_disp = self.min_disp + self.num_disp
+        self.block_size = level.get("block_size", self.block_size)
+        # P1 et P2 sont proportionnels à la surface du bloc (8·bs² et 32·bs² dans la documentation d'OpenCV) :
+        # ils suivent la taille de bloc en gardant le rapport choisi pour la taille de référence
+        reference_block, reference_P1, reference_P2 = self.penalty_reference
+        factor = (self.block_size / reference_block) ** 2
+        self.P1 = max(1, int(round(reference_P1 * factor)))
+        self.P2 = max(self.P1 + 1, int(round(reference_P2 * factor)))
 
-        # Rectification des images en utilisant les données de calibration
-        rectify_pair = self.calibration.rectify((self.images["left"], self.images["right"]))
+    def stereo_taking(self):
+        """
+        Capture et rectifie les images stéréo.
+        """
+        # Capture des images des caméras gauche et droite en niveaux de gris, directement dans les tampons
+        width, height = self.cam_capture.preview_size
+        for side, cam_id in (("left", self.cam_capture.left_cam_id), ("right", self.cam_capture.right_cam_id)):
+            self.images[side] = self.cam_capture.capture_gray(cam_id, self.pool.get(side, (height, width)))
+
+        # Rectification des images avec les cartes de remappage de leur résolution (construites au premier appel)
+        shape = self.images["left"].shape[:2]
+        rectify_pair = self.calibration.rectify((self.images["left"], self.images["right"]),
+                                                out=(self.pool.get("left_rectify", shape),
+                                                     self.pool.get("right_rectify", shape)))
         for i, side in enumerate(("left_rectify", "right_rectify")):
             self.images[side] = rectify_pair[i]
 
     def save_images(self):
         """
-        Sauvegarde les images et la carte de disparité normalisée.
+        Sauvegarde les images, la carte de disparité colorisée et la profondeur en mètres (format 'dpth').
+
+        L'encodage et l'écriture sont faits en arrière-plan pour ne pas ralentir la boucle d'affichage. Les
+        tableaux étant réutilisés à l'image suivante, l'écrivain en reçoit une copie.
         """
+        writer = get_writer()
         for side in ("left", "right", "left_rectify", "right_rectify"):
-            file_create(self.images[side], side + str(self.n), 'png')
-        if self.disparity_normalized is not None:
-            file_create(self.disparity_normalized, "depthmap" + str(self.n), 'png')
+            writer.submit(self.images[side], side + str(self.n), 'png', copy=True)
+        if self.disparity_color is not None:
+            writer.submit(self.disparity_color, "depthmap" + str(self.n), 'png', copy=True)
+            writer.submit(self.depth, "depth" + str(self.n), 'dpth', copy=True)
             self.n += 1
 
     def depth_map_calcul(self):
         """
         Calcule la carte de disparité à partir des images rectifiées.
+
+        Les résultats sont écrits dans les tableaux de la réserve et sont donc réécrits à l'image suivante.
         """
-        # Création de l'objet StereoSGBM pour le calcul de la carte de disparité
-        stereo = cv2.StereoSGBM_create(
-            minDisparity=self.min_disp,
-            numDisparities=self.num_disp,
-            blockSize=self.block_size,
-            P1=self.P1,
-            P2=self.P2,
-            uniquenessRatio=self.uniquenessRatio,
-            speckleWindowSize=self.speckleWindowSize,
-            speckleRange=self.speckleRange,
-            disp12MaxDiff=self.disp12MaxDiff)
+        pool = self.pool
+        left, right = self.images["left_rectify"], self.images["right_rectify"]
+        height, width = left.shape[:2]
+        scale = self.processing_scale
+        min_disp, num_disp = self.min_disp, self.num_disp
+        if scale != 1.0:
+            # Traitement à résolution réduite : la plage de disparité est réduite dans la même proportion
+            size = (int(round(width * scale)), int(round(height * scale)))
+            left = cv2.resize(left, size, dst=pool.get("left_scaled", size[::-1]), interpolation=cv2.INTER_AREA)
+            right = cv2.resize(right, size, dst=pool.get("right_scaled", size[::-1]),
+                               interpolation=cv2.INTER_AREA)
+            min_disp = int(round(self.min_disp * scale))
+            num_disp = max(16, int(np.ceil(self.num_disp * scale / 16)) * 16)
+
+        # Paramètres du moteur de disparité (l'objet d'OpenCV n'est recréé que s'ils changent)
+        params = MatcherParameters(min_disp=min_disp,
+                                   num_disp=num_disp,
+                                   block_size=self.block_size,
+                                   P1=self.P1,
+                                   P2=self.P2,
+                                   uniqueRatio=self.uniquenessRatio,
+                                   speckleWindowSize=self.speckleWindowSize,
+                                   speckleRange=self.speckleRange,
+                                   disp12MaxDiff=self.disp12MaxDiff)
 
         # Calcul de la disparité
-        self.disparity = stereo.compute(self.images["left_rectify"], self.images["right_rectify"])
-        self.disparity = self.disparity.astype(np.float32) / 16.0  # Normalisation pour calculer
-        self.disparity[self.disparity < 0] = 0  # Filtrage des valeurs négatives
-        # Normalisation pour affichage
-        self.disparity_normalized = cv2.normalize(self.disparity, None, alpha=255, beta=0, norm_type=cv2.NORM_MINMAX,
-                                                  dtype=cv2.CV_8U)
+        shape = left.shape[:2]
+        fixed_disparity, valid = self.engine.compute(left, right, params, pool.get("fixed_disparity", shape, np.int16),
+                                                     pool.get("valid", shape, bool))
+        # Disparité en pixels pleine résolution
+        self.disparity = np.multiply(fixed_disparity, np.float32(1.0 / (16.0 * scale)),
+                                     out=pool.get("disparity" if scale == 1.0 else "disparity_scaled", shape,
+                                                  np.float32))
+        np.multiply(self.disparity, valid, out=self.disparity)  # Filtrage des pixels invalides
+        if scale != 1.0:
+            self.disparity = cv2.resize(self.disparity, (width, height),
+                                        dst=pool.get("disparity", (height, width), np.float32),
+                                        interpolation=cv2.INTER_NEAREST)
+        np.maximum(self.disparity, 0, out=self.disparity)  # Filtrage des valeurs négatives
+        if self.hole_filler is not None:
+            # Remplissage des pixels invalides avant le calcul de la profondeur
+            self.disparity = self.hole_filler.fill(self.disparity, self.images["left_rectify"],
+                                                   (self.min_disp, self.min_disp + self.num_disp))
+        # Normalisation sur un canal pour les traitements
+        self.disparity_normalized = cv2.normalize(self.disparity, pool.get("normalized", (height, width), np.uint8),
+                                                  alpha=255, beta=0, norm_type=cv2.NORM_MINMAX, dtype=cv2.CV_8U)
+        # Colorisation à échelle fixe et bandes de profondeur en une seule passe de table de correspondance
+        index = self.colorizer.index_from_disparity(self.disparity, pool.get("lut_index", (height, width), np.intp),
+                                                    pool.get("lut_work", (height, width), np.float32))
+        self.disparity_color, self.depth_labels = self.colorizer.apply(
+            index, pool.get("lut_packed", (height, width), np.uint32))
 
     def depth_calcul(self):
         """
         Calcule la profondeur pour chaque pixel à partir de la carte de disparité.
         """
+        shape = self.disparity.shape
         # Initialisation de la profondeur
-        self.depth = np.zeros_like(self.disparity)
-        valid_disparity_mask = (self.disparity > 0)
+        self.depth = self.pool.get("depth", shape, self.disparity.dtype)
+        self.depth.fill(0)
+        valid_disparity_mask = np.greater(self.disparity, 0, out=self.pool.get("depth_valid", shape, bool))
         # Calcul de la profondeur
-        self.depth[valid_disparity_mask] = self.focale * self.baseline / self.disparity[valid_disparity_mask]
+        np.divide(self.focale * self.baseline, self.disparity, out=self.depth, where=valid_disparity_mask)
 
     def process_stereo(self):
         """
@@ -131,13 +300,35 @@ class StereoVision:
             depth_map=self.depth,
             disparity=self.disparity_normalized,
             pixel_min=20000,
-            thresholds=[50, 100, 200, 255],
+            thresholds=self.depth_thresholds,
+            labels=self.depth_labels,
             kernel_size=5,
             dilate_iterations=1,
             erode_iterations=2
         )
         processor_stereo.process_disparity_image()
 
+    def compute_frame(self):
+        """
+        Capture une paire, calcule la carte de disparité et la profondeur, et ajuste la qualité si le régulateur
+        de cadence est actif.
+
+        Une fois la première image traitée, aucun tableau n'est alloué (hors remplissage des trous et moteur
+        incrémental) : les résultats sont réécrits à chaque appel.
+        """
+        if self.heartbeat is not None:
+            self.heartbeat.beat()
+        start = time.perf_counter()
+        # Capture et traitement des images stéréo
+        self.stereo_taking()
+        self.depth_map_calcul()
+        self.depth_calcul()
+        self.obstacles, self.occupancy = self.obstacle_map.update(self.depth)
+        self.regions.update(self.depth)
+        if self.quality_controller is not None:
+            # Ajustement de la qualité selon la latence de l'image
+            self.quality_controller.update(time.perf_counter() - start)
+
     def capture_and_compute(self, queue):
         """
         Capture les images, calcule la carte de disparité et la profondeur, puis place les résultats dans une file
@@ -145,18 +336,56 @@ class StereoVision:
 
         :param queue: File d'attente pour transmettre les résultats entre les processus
         """
-        while not self.stop_event.is_set():
-            # Capture et traitement des images stéréo
-            self.stereo_taking()
-            self.depth_map_calcul()
-            self.depth_calcul()
-            # Place les résultats dans la file d'attente
-            queue.put((self.disparity_normalized, self.depth))
+        try:
+            while not self.stop_event.is_set():
+                self.compute_frame()
+                # Place une copie des résultats dans la file d'attente (les tableaux sont sérialisés en
+                # arrière-plan alors que les tampons sont réécrits à l'image suivante)
+                queue.put((self.disparity_color.copy(), self.depth_labels.copy(), self.depth.copy()))
+        finally:
+            # Les caméras sont libérées même après une erreur, pour que le processus relancé puisse les ouvrir
+            self.cam_capture.close_cameras()
+            queue.put((None, None, None))  # Envoyer un signal de fin de traitement pour le processus d'affichage
+            print("Capture et traitement des images arrêtés.")
+
+    def publish_frame(self, server, frame, source="stereo"):
+        """
+        Publie les résultats de la dernière image calculée sur le serveur de diffusion.
+
+        Chaque image produit cinq flux : 'depth' (profondeur en mètres, float32), 'labels' (bandes de
+        profondeur), 'color' (carte colorisée), 'obstacles' (distance de l'obstacle le plus proche par colonne)
+        et 'occupancy' (grille d'occupation vue de dessus), qui partagent le même numéro d'image.
 
-        # Assurez-vous que la file d'attente est vide avant de quitter
-        queue.put((None, None))  # Envoyer un signal de fin de traitement pour le processus d'affichage
+        :param server: Instance démarrée de DepthStreamServer
+        :param frame: Numéro de l'image
+        :param source: Nom de la source indiqué dans les métadonnées
+        """
+        metadata = {"source": source, "frame": frame, "thresholds": self.depth_thresholds}
+        server.publish(self.depth, name="depth", unit="m", **metadata)
+        server.publish(self.depth_labels, name="labels", **metadata)
+        server.publish(self.disparity_color, name="color", **metadata)
+        server.publish(self.obstacles, name="obstacles", unit="m", **metadata)
+        server.publish(self.occupancy, name="occupancy", cell_size=self.obstacle_map.cell_size, **metadata)
+
+    def run_headless(self, server):
+        """
+        Calcule la profondeur en continu sans affichage et la publie sur le serveur de diffusion (voir
+        publish_frame).
 
-        print("Capture et traitement des images arrêtés.")
+        :param server: Instance démarrée de DepthStreamServer
+        """
+        frame = 0
+        try:
+            while not self.stop_event.is_set():
+                self.compute_frame()
+                frame += 1
+                self.publish_frame(server, frame)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            self.cam_capture.close_cameras()
+            print("Diffusion de la vision stéréo arrêtée.")
 
     def depth_map_display(self, queue):
         """
@@ -164,53 +393,50 @@ class StereoVision:
 
         :param queue: File d'attente pour obtenir les résultats calculés
         """
-        while not self.stop_event.is_set() or not queue.empty():
-            if not queue.empty():
-                self.disparity_normalized, self.depth = queue.get()
-                # Application d'une carte de couleur pour améliorer l'affichage
-                disparity_normalized_color = cv2.applyColorMap(self.disparity_normalized, cv2.COLORMAP_JET)
-                cv2.imshow("disparity", disparity_normalized_color)
-                key = cv2.waitKey(1)  # Attendre une courte période pour les événements de la fenêtre
-                if key == ord('q'):  # Quitter si la touche 'q' est pressée
-                    self.stop_event.set()  # Signaler à l'autre processus de s'arrêter
-                elif key == ord('s'):  # Sauvegarder les images et la carte de profondeur si la touche 's' est pressée
-                    self.save_images()
-                elif key == ord('t'):  # Traiter les images stéréo si la touche 't' est pressée
-                    self.process_stereo()
+        parent = parent_process()
+        while not self.stop_event.is_set():
+            if parent is not None and not parent.is_alive():
+                # Processus de capture disparu (tué par le superviseur) : l'affichage s'arrête aussi
+                break
+            try:
+                self.disparity_color, self.depth_labels, self.depth = queue.get(timeout=0.1)
+            except queue_module.Empty:
+                continue
+            if self.disparity_color is None:
+                break
+            # La carte est déjà colorisée par la table de correspondance
+            cv2.imshow("disparity", self.disparity_color)
+            key = cv2.waitKey(1)  # Attendre une courte période pour les événements de la fenêtre
+            if key == ord('q'):  # Quitter si la touche 'q' est pressée
+                self.stop_event.set()  # Signaler à l'autre processus de s'arrêter
+            elif key == ord('s'):  # Sauvegarder les images et la carte de profondeur si la touche 's' est pressée
+                self.save_images()
+            elif key == ord('t'):  # Traiter les images stéréo si la touche 't' est pressée
+                self.process_stereo()
+        # Termine les sauvegardes en cours avant de quitter le processus
+        close_writer()
         cv2.destroyAllWindows()
 
     def process_and_display(self):
         """
-        Crée des processus pour la capture et le calcul des images, ainsi que pour l'affichage des résultats.
+        Calcule la profondeur dans le processus courant et l'affiche dans un processus fils.
+
+        La capture reste dans le processus courant (surveillé par le superviseur) : s'il est arrêté, les caméras
+        sont libérées avec lui. Le processus d'affichage est un processus démon qui s'arrête avec l'événement
+        d'arrêt, à la fin de la capture ou à la disparition de son parent.
         """
         queue = Queue()
-
-        # Création des processus
-        capture_process = Process(target=self.capture_and_compute, args=(queue,))
-        display_process = Process(target=self.depth_map_display, args=(queue,))
-
+        display_process = Process(target=self.depth_map_display, args=(queue,), daemon=True)
+        display_process.start()
         try:
-            # Démarrage des processus
-            capture_process.start()
-            display_process.start()
-
-            # Attente de la fin des processus
-            capture_process.join()
-            display_process.join()
-
+            self.capture_and_compute(queue)
         except KeyboardInterrupt:
-            print("Interruption détectée. Arrêt des processus...")
-            self.stop_event.set()  # Signaler aux processus de s'arrêter
-
-        finally:    
-            # Assurez-vous que les processus sont terminés correctement
-            if capture_process.is_alive():
-                capture_process.terminate()
-                capture_process.join()
-
+            print("Interruption détectée. Arrêt de l'affichage...")
+        finally:
+            self.stop_event.set()  # Signaler au processus d'affichage de s'arrêter
+            display_process.join(3)
             if display_process.is_alive():
                 display_process.terminate()
                 display_process.join()
-
-            # Nettoyage des fenêtres OpenCV
-            cv2.destroyAllWindows()
+            # Le processus d'affichage ne lit plus la file : la fin du processus ne doit pas attendre son vidage
+            queue.cancel_join_thread()
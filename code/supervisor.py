@@ -0,0 +1,205 @@
+import time
+import signal
+import multiprocessing
+
+# Les processus sont créés par fork : les données préchargées par le processus parent (calibration, cartes de
+# remappage, modules importés) sont partagées sans sérialisation ni rechargement, ce qui rend un redémarrage rapide
+_context = multiprocessing.get_context('fork')
+
+
+class Heartbeat:
+    def __init__(self):
+        """
+        Battement de cœur partagé entre un processus de travail et le superviseur (mémoire partagée).
+        """
+        self.value = _context.Value('d', time.monotonic(), lock=False)
+
+    def beat(self):
+        """Signale que le processus est vivant (à appeler à chaque image)."""
+        self.value.value = time.monotonic()
+
+    def age(self):
+        """
+        Retourne le temps écoulé depuis le dernier battement.
+
+        :return: Durée en secondes
+        """
+        return time.monotonic() - self.value.value
+
+
+def _run_worker(target, args, kwargs, heartbeat, stop_event):
+    """Point d'entrée d'un processus de travail."""
+    # CTRL+C est traité par le superviseur, qui arrête les processus proprement avec leur événement d'arrêt
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    heartbeat.beat()
+    target(*args, heartbeat=heartbeat, stop_event=stop_event, **kwargs)
+
+
+class Worker:
+    def __init__(self, name, target, args=(), kwargs=None):
+        """
+        Processus de travail surveillé.
+
+        :param name: Nom affiché dans le journal
+        :param target: Fonction exécutée dans le processus, appelée avec les arguments heartbeat et stop_event
+                       en plus de args et kwargs ; elle doit appeler heartbeat.beat() régulièrement et se
+                       terminer quand stop_event est levé
+        :param args: Arguments positionnels de la fonction
+        :param kwargs: Arguments nommés de la fonction
+        """
+        self.name = name
+        self.target = target
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.process = None
+        self.heartbeat = Heartbeat()
+        self.stop_event = _context.Event()
+        self.started_at = None
+        self.restart_at = None  # Date du prochain redémarrage prévu (None si aucun)
+        self.restart_delay = 0.0
+        self.restarts = 0
+        self.finished = False  # Terminé normalement : n'est plus redémarré
+
+
+class ProcessSupervisor:
+    def __init__(self, heartbeat_timeout=10.0, restart_delay=0.1, max_restart_delay=10.0, stable_time=30.0,
+                 stop_timeout=3.0, poll_interval=0.2):
+        """
+        Initialise le superviseur des processus de travail (caméra ToF, vision stéréo).
+
+        Un processus qui se termine avec une erreur, ou dont le battement de cœur s'arrête, est redémarré
+        automatiquement. Le délai de redémarrage double à chaque plantage rapproché (processus actif moins de
+        stable_time secondes) pour ne pas boucler sur une caméra absente. Un processus qui se termine
+        normalement (par exemple touche 'q') n'est pas redémarré. L'arrêt passe par l'événement d'arrêt de
+        chaque processus, puis terminate et kill en dernier recours ; tous les processus sont attendus (join),
+        il ne reste donc pas de processus zombie.
+
+        :param heartbeat_timeout: Durée sans battement de cœur au-delà de laquelle un processus est bloqué
+        :param restart_delay: Délai avant le premier redémarrage après un plantage, en secondes
+        :param max_restart_delay: Délai maximal entre deux redémarrages
+        :param stable_time: Durée de fonctionnement après laquelle le délai de redémarrage est réinitialisé
+        :param stop_timeout: Durée laissée à un processus pour s'arrêter proprement
+        :param poll_interval: Période de surveillance en secondes
+        """
+        self.heartbeat_timeout = heartbeat_timeout
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_time = stable_time
+        self.stop_timeout = stop_timeout
+        self.poll_interval = poll_interval
+        self.workers = []
+
+    def add(self, name, target, args=(), kwargs=None):
+        """
+        Ajoute un processus de travail à surveiller.
+
+        :return: Instance de Worker
+        """
+        worker = Worker(name, target, args, kwargs)
+        self.workers.append(worker)
+        return worker
+
+    def _log(self, message):
+        """Affiche un message horodaté."""
+        print(f"[{time.strftime('%H:%M:%S')}] Superviseur : {message}")
+
+    def _spawn(self, worker):
+        """Démarre (ou redémarre) le processus d'un travail."""
+        worker.heartbeat.beat()
+        worker.stop_event.clear()
+        worker.process = _context.Process(target=_run_worker, name=worker.name,
+                                          args=(worker.target, worker.args, worker.kwargs, worker.heartbeat,
+                                                worker.stop_event))
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+
+    def _stop_process(self, worker):
+        """Arrête le processus d'un travail : événement d'arrêt, puis terminate et kill si nécessaire."""
+        process = worker.process
+        if process is None:
+            return
+        worker.stop_event.set()
+        process.join(self.stop_timeout)
+        if process.is_alive():
+            self._log(f"{worker.name} ne répond pas à la demande d'arrêt, terminaison forcée")
+            process.terminate()
+            process.join(1.0)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        worker.process = None
+
+    def _schedule_restart(self, worker, reason):
+        """Prévoit le redémarrage d'un travail avec un délai croissant en cas de plantages rapprochés."""
+        uptime = time.monotonic() - worker.started_at
+        if uptime >= self.stable_time or worker.restart_delay == 0:
+            worker.restart_delay = self.restart_delay
+        else:
+            worker.restart_delay = min(worker.restart_delay * 2, self.max_restart_delay)
+        worker.restart_at = time.monotonic() + worker.restart_delay
+        self._log(f"{worker.name} {reason}, redémarrage dans {worker.restart_delay:.1f} s")
+
+    def start(self):
+        """
+        Démarre tous les processus de travail.
+        """
+        for worker in self.workers:
+            self._spawn(worker)
+            self._log(f"{worker.name} démarré (PID {worker.process.pid})")
+
+    def poll(self):
+        """
+        Vérifie l'état des processus : redémarre ceux qui ont planté ou sont bloqués.
+
+        :return: True tant qu'au moins un travail est actif ou doit être redémarré
+        """
+        now = time.monotonic()
+        for worker in self.workers:
+            if worker.finished:
+                continue
+            if worker.process is None:
+                if worker.restart_at is not None and now >= worker.restart_at:
+                    self._spawn(worker)
+                    worker.restarts += 1
+                    self._log(f"{worker.name} redémarré (PID {worker.process.pid}, redémarrage {worker.restarts})")
+                continue
+
+            if not worker.process.is_alive():
+                worker.process.join()
+                exitcode = worker.process.exitcode
+                worker.process = None
+                if exitcode == 0:
+                    worker.finished = True
+                    self._log(f"{worker.name} terminé")
+                else:
+                    self._schedule_restart(worker, f"arrêté avec le code {exitcode}")
+            elif worker.heartbeat.age() > self.heartbeat_timeout:
+                age = worker.heartbeat.age()
+                self._stop_process(worker)
+                self._schedule_restart(worker, f"bloqué (aucun battement depuis {age:.1f} s)")
+        return not all(worker.finished for worker in self.workers)
+
+    def stop(self):
+        """
+        Arrête proprement tous les processus de travail.
+        """
+        for worker in self.workers:
+            worker.stop_event.set()
+        for worker in self.workers:
+            self._stop_process(worker)
+            worker.finished = True
+        self._log("tous les processus sont arrêtés")
+
+    def run(self):
+        """
+        Démarre les processus et les surveille jusqu'à leur fin ou jusqu'à CTRL+C.
+        """
+        self.start()
+        try:
+            while self.poll():
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            self._log("interruption détectée, arrêt des processus...")
+        finally:
+            self.stop()
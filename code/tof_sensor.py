@@ -1,55 +1,122 @@
 import sys  # Importation pour la gestion des exceptions et des opérations système
+import time  # Importation pour la mesure de la latence par trame
 import cv2  # Importation d'OpenCV pour le traitement d'images
 import numpy as np  # Importation de NumPy pour les opérations mathématiques
 import ArducamDepthCamera as ac  # Importation de la bibliothèque pour la caméra Arducam ToF
 from depth_traitement import DepthMapProcessor  # Importation de la classe pour le traitement de la carte de profondeur
+from file_writer import get_writer, close_writer  # Importation de l'écriture des fichiers en arrière-plan
+from quality_controller import QualityController, tof_levels  # Importation du régulateur de cadence
+from depth_lut import DepthColorizer  # Importation de la colorisation par table de correspondance
+from buffer_pool import BufferPool  # Importation de la réserve de tableaux réutilisés
+from obstacle_map import ObstacleMap  # Importation de la carte des obstacles pour la navigation
+from region_query import DepthIntegral  # Importation des requêtes de profondeur par zone
 
 
 class TofCamera:
-    def __init__(self, max_distance=4):
+    def __init__(self, max_distance=4, target_fps=None, max_frame_skip=3, depth_thresholds=(0.5, 1.0, 2.0, 4.0),
+                 heartbeat=None, fov=70):
         """
         Initialise la caméra ToF avec les paramètres de distance maximale.
 
         :param max_distance: Distance maximale mesurable par la caméra en mètres
+        :param target_fps: Cadence de traitement visée ; si elle est donnée, des trames sont ignorées quand le
+                           traitement ne tient pas le budget
+        :param max_frame_skip: Nombre maximal de trames ignorées entre deux traitements
+        :param depth_thresholds: Limites des bandes de profondeur en mètres utilisées pour la segmentation
+        :param heartbeat: Battement de cœur signalé à chaque trame au superviseur (facultatif)
+        :param fov: Champ de vision diagonal de la caméra en degrés, pour la carte des obstacles
         """
         self.cam = ac.ArducamCamera()  # Création d'une instance de la caméra Arducam
         self.max_distance = max_distance  # Distance maximale pour normaliser la profondeur
         self.frame = None  # Cadre actuel capturé par la caméra
         self.amplitude_buf = None  # Tampon pour les données d'amplitude
         self.depth_buf = None  # Tampon pour les données de profondeur
-        self.depth_normalized = None  # Carte de profondeur normalisée pour affichage
+        self.depth_valid = None  # Profondeur avec les pixels invalides (faible amplitude) à zéro
+        self.depth_normalized = None  # Profondeur normalisée sur un canal (uint8, 255 au plus près)
+        self.depth_color = None  # Carte de profondeur colorisée à échelle fixe pour affichage
+        self.depth_labels = None  # Numéro de la bande de profondeur de chaque pixel
         self.result_image = None  # Image résultante après traitement
         self.n = 0  # Compteur pour le nom des images sauvegardées
+        self.frame_skip = 0  # Nombre de trames ignorées entre deux trames traitées
+        self.frame_count = 0  # Compteur des trames reçues
+        self.pool = BufferPool()  # Tableaux réutilisés d'une trame à l'autre
+        self.heartbeat = heartbeat
+        self.fov = fov
+        # Distance de l'obstacle le plus proche par colonne et grille d'occupation (carte créée à la première
+        # trame, la focale dépendant de la résolution)
+        self.obstacle_map = None
+        self.obstacles = None
+        self.occupancy = None
+        # Requêtes de profondeur moyenne par zone rectangulaire sur la trame courante (self.regions.query)
+        self.regions = DepthIntegral()
+        # Table de couleurs et de bandes de profondeur (au millimètre), construite une seule fois
+        self.depth_thresholds = list(depth_thresholds)
+        self.colorizer = DepthColorizer.for_depth(max_distance, self.depth_thresholds)
+        # Régulateur de la cadence de traitement
+        self.quality_controller = None
+        if target_fps is not None:
+            self.quality_controller = QualityController(tof_levels(max_frame_skip), target_fps, self.set_quality,
+                                                        name="ToF")
+
+    def set_quality(self, level):
+        """
+        Applique un niveau de qualité (utilisé par le régulateur de cadence).
+
+        :param level: Dictionnaire contenant frame_skip
+        """
+        self.frame_skip = level.get("frame_skip", self.frame_skip)
 
     def process_frame(self) -> np.ndarray:
         """
         Traite le cadre capturé pour produire une image résultante en combinant les données de profondeur
         et d'amplitude.
 
+        Les résultats sont écrits dans les tableaux de la réserve et sont donc réécrits à la trame suivante.
+
         :return: Image résultante après traitement
         """
         if self.depth_buf is None or self.amplitude_buf is None:
             raise ValueError("Le tampon de profondeur et le tampon d'amplitude ne doivent pas être None.")
 
-        # Conversion des valeurs NaN en zéro pour le tampon de profondeur
-        self.depth_buf = np.nan_to_num(self.depth_buf)
-        # Seuil des données d'amplitude
-        self.amplitude_buf = np.where(self.amplitude_buf <= 7, 0, 255)
+        shape = self.depth_buf.shape
+        # Conversion des valeurs non finies (NaN) en zéro pour le tampon de profondeur
+        invalid = np.isfinite(self.depth_buf, out=self.pool.get("invalid", shape, bool))
+        np.logical_not(invalid, out=invalid)
+        np.copyto(self.depth_buf, 0, where=invalid)
+        # Profondeur en millimètres, utilisée comme indice de la table de correspondance
+        index = self.colorizer.index_from_depth(self.depth_buf, self.pool.get("lut_index", shape, np.intp),
+                                                self.pool.get("lut_work", shape, np.float32))
+        # Les pixels de trop faible amplitude sont invalides (indice 0)
+        low_amplitude = np.less_equal(self.amplitude_buf, 7, out=self.pool.get("low_amplitude", shape, bool))
+        np.copyto(index, 0, where=low_amplitude)
+        # Profondeur des seuls pixels valides, pour la carte des obstacles et les requêtes par zone
+        self.depth_valid = self.pool.get("depth_valid", shape, np.float32)
+        np.copyto(self.depth_valid, self.depth_buf)
+        np.copyto(self.depth_valid, 0, where=low_amplitude)
 
-        # Normalisation des données de profondeur
-        normalized_depth = (1 - (self.depth_buf / self.max_distance)) * 255
-        normalized_depth = np.clip(normalized_depth, 0, 255).astype(np.uint8)
-        self.depth_normalized = normalized_depth
-        # Combinaison des données de profondeur normalisées et d'amplitude
-        result_frame = normalized_depth & self.amplitude_buf.astype(np.uint8)
-        return result_frame
+        # Colorisation et bandes de profondeur en une seule passe
+        self.depth_color, self.depth_labels = self.colorizer.apply(
+            index, self.pool.get("lut_packed", shape, np.uint32))
+
+        # Profondeur normalisée sur un seul canal : (1 - profondeur / distance maximale) * 255
+        work = np.divide(self.depth_buf, self.max_distance, out=self.pool.get("normalized_work", shape, np.float32))
+        np.subtract(1, work, out=work)
+        np.multiply(work, 255, out=work)
+        np.clip(work, 0, 255, out=work)
+        self.depth_normalized = self.pool.get("normalized", shape, np.uint8)
+        np.copyto(self.depth_normalized, work, casting='unsafe')
+        return self.depth_color
 
     def capture_image(self):
         """
-        Sauvegarde l'image résultante sous le nom tof{n}.png.
+        Sauvegarde l'image résultante sous le nom tof{n}.png et la profondeur en mètres sous le nom tof{n}.dpth.
+
+        L'écriture est faite en arrière-plan ; les tableaux étant réutilisés à la trame suivante, l'écrivain en
+        reçoit une copie.
         """
         if self.result_image is not None:
-            cv2.imwrite(f"tof{self.n}.png", self.result_image)
+            get_writer().submit(self.result_image, f"tof{self.n}", 'png', copy=True)
+            get_writer().submit(self.depth_buf, f"tof{self.n}", 'dpth', copy=True)
             print(f"Image sauvegardée sous le nom tof{self.n}.png")
             self.n += 1
         else:
@@ -64,19 +131,19 @@ class TofCamera:
                 disparity=self.depth_normalized,
                 pixel_min=18000,
                 min_contour_area=20,
-                thresholds=[50, 100, 200, 255],
+                thresholds=self.depth_thresholds,
                 kernel_size=5,
                 dilate_iterations=1,
-                erode_iterations=3
+                erode_iterations=3,
+                labels=self.depth_labels
             )
         processor.process_disparity_image()
 
-    def continuous_display(self):
+    def open_camera(self):
         """
-        Capture et affiche les images en continu à partir de la caméra ToF, avec des options pour sauvegarder
-        et traiter les images.
+        Ouvre la connexion à la caméra ToF, démarre le flux de données de profondeur et configure la distance
+        maximale.
         """
-        # Ouverture de la connexion à la caméra ToF et démarrage du flux de données de profondeur
         if self.cam.open(ac.TOFConnect.CSI, 0) != 0 or self.cam.start(ac.TOFOutput.DEPTH) != 0:
             print("Échec de l'initialisation ou du démarrage de la caméra")
             sys.exit(1)
@@ -84,24 +151,92 @@ class TofCamera:
         # Configuration de la distance maximale de la caméra
         self.cam.setControl(ac.TOFControl.RANG, self.max_distance)
 
+    def read_frame(self):
+        """
+        Capture une trame et la traite, sauf si elle doit être ignorée pour tenir la cadence visée.
+
+        :return: True si une trame a été traitée, False si elle a été ignorée ou si la capture a échoué
+        """
+        if self.heartbeat is not None:
+            self.heartbeat.beat()
+        # Capture d'une trame depuis la caméra
+        self.frame = self.cam.requestFrame(200)
+        if self.frame is None:
+            print("Échec de la capture de la trame")
+            return False
+        self.frame_count += 1
+        if self.frame_count % (self.frame_skip + 1) != 0:
+            # Trame ignorée pour alléger la charge : elle est seulement libérée
+            self.cam.releaseFrame(self.frame)
+            return False
+        start = time.perf_counter()
+        # Copie des données de profondeur et d'amplitude dans les tampons avant de libérer la trame
+        depth = self.frame.getDepthData()
+        amplitude = self.frame.getAmplitudeData()
+        self.depth_buf = self.pool.get("depth", depth.shape, np.float32)
+        np.copyto(self.depth_buf, depth)
+        self.amplitude_buf = self.pool.get("amplitude", amplitude.shape, np.float32)
+        # Normalisation et traitement des données d'amplitude
+        np.multiply(amplitude, 255 / 1024, out=self.amplitude_buf)
+        np.clip(self.amplitude_buf, 0, 255, out=self.amplitude_buf)
+        self.cam.releaseFrame(self.frame)  # Libération de la trame après traitement
+
+        # Traitement du cadre pour obtenir l'image résultante
+        # (l'image est déjà colorisée par la table de correspondance)
+        self.result_image = self.process_frame()
+        if self.obstacle_map is None:
+            height, width = self.depth_buf.shape
+            focale = np.hypot(width, height) / 2 / np.tan(np.radians(self.fov) / 2)
+            self.obstacle_map = ObstacleMap(focale, max_distance=self.max_distance)
+        # Les pixels de faible amplitude, invalides dans la carte colorisée, sont aussi exclus ici
+        self.obstacles, self.occupancy = self.obstacle_map.update(self.depth_valid)
+        self.regions.update(self.depth_valid)
+        if self.quality_controller is not None:
+            # Ajustement de la cadence selon le coût de traitement par trame reçue : la latence est répartie sur
+            # la trame traitée et les trames ignorées, ce qui referme la boucle sur frame_skip
+            self.quality_controller.update((time.perf_counter() - start) / (self.frame_skip + 1))
+        return True
+
+    def stream(self, server, stop_event=None):
+        """
+        Capture les trames en continu sans affichage et les publie sur le serveur de diffusion.
+
+        Chaque trame produit les flux 'depth' (profondeur en mètres, float32), 'labels' (bandes de profondeur),
+        'color' (carte colorisée), 'obstacles' (distance de l'obstacle le plus proche par colonne) et 'occupancy'
+        (grille d'occupation vue de dessus), qui partagent le même numéro de trame.
+
+        :param server: Instance démarrée de DepthStreamServer
+        :param stop_event: Événement d'arrêt (facultatif, sinon arrêt par CTRL+C)
+        """
+        self.open_camera()
         try:
-            while True:
-                # Capture d'une trame depuis la caméra
-                self.frame = self.cam.requestFrame(200)
-                if self.frame is not None:
-                    # Obtention des données de profondeur et d'amplitude
-                    self.depth_buf = self.frame.getDepthData()
-                    self.amplitude_buf = self.frame.getAmplitudeData()
-                    self.cam.releaseFrame(self.frame)  # Libération de la trame après traitement
-
-                    # Normalisation et traitement des données d'amplitude
-                    self.amplitude_buf = np.clip(self.amplitude_buf * (255 / 1024), 0, 255)
-
-                    # Traitement du cadre pour obtenir l'image résultante
-                    self.result_image = self.process_frame()
-                    # Application d'une carte de couleur pour améliorer l'affichage
-                    self.result_image = cv2.applyColorMap(self.result_image, cv2.COLORMAP_JET)
+            while stop_event is None or not stop_event.is_set():
+                if self.read_frame():
+                    metadata = {"source": "tof", "frame": self.frame_count, "thresholds": self.depth_thresholds}
+                    server.publish(self.depth_buf, name="depth", unit="m", **metadata)
+                    server.publish(self.depth_labels, name="labels", **metadata)
+                    server.publish(self.result_image, name="color", **metadata)
+                    server.publish(self.obstacles, name="obstacles", unit="m", **metadata)
+                    server.publish(self.occupancy, name="occupancy", cell_size=self.obstacle_map.cell_size,
+                                   **metadata)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            self.cleanup(windows=False)
+
+    def continuous_display(self, stop_event=None):
+        """
+        Capture et affiche les images en continu à partir de la caméra ToF, avec des options pour sauvegarder
+        et traiter les images.
 
+        :param stop_event: Événement d'arrêt (facultatif, sinon arrêt par 'q' ou CTRL+C)
+        """
+        self.open_camera()
+
+        try:
+            while stop_event is None or not stop_event.is_set():
+                if self.read_frame():
                     # Affichage de l'image résultante
                     cv2.imshow("ToF Camera", self.result_image)
 
@@ -113,21 +248,23 @@ class TofCamera:
                         self.capture_image()
                     elif key == ord('t'):  # Traiter les données de profondeur si la touche 't' est pressée
                         self.process_tof()
-                else:
-                    print("Échec de la capture de la trame")
 
         except KeyboardInterrupt:
             pass
         finally:
             self.cleanup()  # Nettoyage des ressources à la fin de l'exécution
 
-    def cleanup(self):
+    def cleanup(self, windows=True):
         """
         Arrête et ferme la caméra, et détruit toutes les fenêtres OpenCV.
+
+        :param windows: Détruire les fenêtres OpenCV (False en mode sans affichage)
         """
         self.cam.stop()
         self.cam.close()
-        cv2.destroyAllWindows()
+        close_writer()  # Termine les sauvegardes en cours
+        if windows:
+            cv2.destroyAllWindows()
 
     def get_depth_buf(self):
         """
@@ -141,6 +278,14 @@ class TofCamera:
         """
         Retourne la carte de profondeur normalisée.
 
-        :return: Carte de profondeur normalisée
+        :return: Carte de profondeur normalisée sur un canal (uint8)
         """
         return self.depth_normalized
+
+    def get_depth_color(self):
+        """
+        Retourne la carte de profondeur colorisée.
+
+        :return: Carte de profondeur colorisée (BGR)
+        """
+        return self.depth_color
@@ -0,0 +1,78 @@
+"""
+Aller-retour en boucle locale entre DepthStreamServer et DepthStreamClient.
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "code"))
+
+from depth_stream import DepthStreamServer, DepthStreamClient  # noqa: E402
+
+
+def _wait_for(condition, timeout=5.0):
+    """Attend qu'une condition soit vraie (connexion d'un abonné, vidage d'une file)."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("Condition non atteinte")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def server():
+    server = DepthStreamServer(('127.0.0.1', 0)).start()  # Port éphémère
+    yield server
+    server.close()
+
+
+def test_round_trip_float32_and_uint8(server):
+    depth = np.random.default_rng(0).uniform(0.2, 5.0, (120, 160)).astype(np.float32)
+    color = np.random.default_rng(1).integers(0, 256, (120, 160, 3), np.uint8)
+    with DepthStreamClient(server.address, timeout=5) as client:
+        _wait_for(lambda: server.subscriber_count() == 1)
+        server.publish(depth, name="depth", unit="m", frame=7)
+        received, metadata = client.receive()
+        assert received.dtype == np.float32
+        assert received.shape == depth.shape
+        np.testing.assert_array_equal(received, depth)
+        assert metadata["name"] == "depth"
+        assert metadata["unit"] == "m"
+        assert metadata["frame"] == 7
+
+        # Réception dans un tableau préalloué
+        out = np.empty_like(color)
+        server.publish(color, name="color", frame=8)
+        received, metadata = client.receive(out=out)
+        assert received is out
+        assert received.dtype == np.uint8
+        assert received.shape == color.shape
+        np.testing.assert_array_equal(received, color)
+        assert metadata["name"] == "color"
+        assert metadata["frame"] == 8
+
+
+def test_slow_client_only_sees_latest_frame(server):
+    # Images assez grosses pour remplir les tampons de la socket pendant que le client ne lit pas
+    frame = np.empty((1000, 1000), np.float32)
+    published = 20
+    with DepthStreamClient(server.address, timeout=5) as client:
+        _wait_for(lambda: server.subscriber_count() == 1)
+        subscriber = server.subscribers[0]
+        for index in range(published):
+            frame.fill(index)
+            server.publish(frame, name="depth", frame=index)
+
+        # Le client lit tout ce qui lui a été envoyé
+        received = []
+        while not received or received[-1] != published - 1:
+            array, metadata = client.receive()
+            assert array[0, 0] == metadata["frame"]
+            received.append(metadata["frame"])
+
+    assert received == sorted(received)
+    assert len(received) < published
+    assert subscriber.dropped == published - len(received)
@@ -0,0 +1,200 @@
+"""
+Vérifie qu'une fois la première image traitée, la boucle de traitement n'alloue plus de tableaux
+(StereoVision.compute_frame et TofCamera.read_frame), avec des caméras simulées.
+"""
+import sys
+import types
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+pytest.importorskip("matplotlib")  # Utilisé par depth_traitement
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "code"))
+
+STEREO_SIZE = (320, 240)  # (largeur, hauteur)
+TOF_SHAPE = (180, 240)  # (hauteur, largeur)
+WARMUP_FRAMES = 3
+MEASURED_FRAMES = 10
+
+
+class FakeRequest:
+    """Requête de capture simulée : donne accès au tampon de la caméra, sans copie."""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def release(self):
+        pass
+
+
+class FakeMappedArray:
+    """Équivalent de picamera2.MappedArray : vue sur le tampon d'une requête."""
+
+    def __init__(self, request, stream):
+        self.array = request.buffer
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakePicamera2:
+    """Caméra simulée : une scène texturée, décalée horizontalement pour la caméra droite."""
+
+    def __init__(self, camera_id=0):
+        self.camera_id = camera_id
+        self.buffer = None
+
+    def create_video_configuration(self, main):
+        return main
+
+    def configure(self, config):
+        width, height = config["size"]
+        scene = np.random.default_rng(0).integers(0, 256, (height, width + 32, 3), np.uint8)
+        shift = 0 if self.camera_id == 0 else 16
+        self.buffer = np.ascontiguousarray(scene[:, shift:shift + width])
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+    def capture_request(self):
+        return FakeRequest(self.buffer)
+
+
+class FakeTofFrame:
+    def __init__(self, depth, amplitude):
+        self.depth = depth
+        self.amplitude = amplitude
+
+    def getDepthData(self):
+        return self.depth
+
+    def getAmplitudeData(self):
+        return self.amplitude
+
+
+class FakeArducamCamera:
+    """Caméra ToF simulée : les trames sont des vues sur des tampons du pilote, comme le SDK."""
+
+    def __init__(self):
+        rng = np.random.default_rng(1)
+        depth = rng.uniform(0.2, 4.0, TOF_SHAPE).astype(np.float32)
+        depth[:10] = np.nan
+        amplitude = rng.uniform(0, 1024, TOF_SHAPE).astype(np.float32)
+        self.frame = FakeTofFrame(depth, amplitude)
+
+    def open(self, *args):
+        return 0
+
+    def start(self, *args):
+        return 0
+
+    def setControl(self, *args):
+        pass
+
+    def requestFrame(self, timeout):
+        return self.frame
+
+    def releaseFrame(self, frame):
+        pass
+
+    def stop(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _install_fake_modules():
+    """Remplace les bibliothèques des caméras (absentes hors de la Raspberry Pi) par les caméras simulées."""
+    picamera2 = types.ModuleType("picamera2")
+    picamera2.Picamera2 = FakePicamera2
+    picamera2.MappedArray = FakeMappedArray
+    picamera2.Preview = types.SimpleNamespace(QTGL=None, NULL=None)
+    sys.modules["picamera2"] = picamera2
+
+    arducam = types.ModuleType("ArducamDepthCamera")
+    arducam.ArducamCamera = FakeArducamCamera
+    arducam.TOFConnect = types.SimpleNamespace(CSI=0)
+    arducam.TOFOutput = types.SimpleNamespace(DEPTH=0)
+    arducam.TOFControl = types.SimpleNamespace(RANG=0)
+    sys.modules["ArducamDepthCamera"] = arducam
+
+
+_install_fake_modules()
+
+
+def _calibration():
+    """Calibration synthétique d'une paire parallèle (les cartes sont construites pour STEREO_SIZE)."""
+    from calibration_camera import StereoCalibration
+
+    calibration = StereoCalibration()
+    width, height = 2 * STEREO_SIZE[0], 2 * STEREO_SIZE[1]
+    cam_mat = np.array([[600.0, 0, width / 2], [0, 600.0, height / 2], [0, 0, 1]])
+    for side in ("left", "right"):
+        calibration.cam_mats[side] = cam_mat
+        calibration.dist_coefs[side] = np.zeros(5)
+    calibration.rot_mat = np.eye(3)
+    calibration.trans_vec = np.array([[-0.06], [0.0], [0.0]])
+    calibration.image_size = (width, height)
+    return calibration
+
+
+def _growth(step, pool):
+    """
+    Mesure la mémoire allouée par la boucle après le préchauffage.
+
+    :return: Tuple (croissance de la mémoire en octets, pic au-dessus du niveau de départ, nouvelles allocations
+             de la réserve)
+    """
+    for _ in range(WARMUP_FRAMES):
+        step()
+    allocations = pool.allocations
+    tracemalloc.start()
+    try:
+        start, _ = tracemalloc.get_traced_memory()
+        for _ in range(MEASURED_FRAMES):
+            step()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return current - start, peak - start, pool.allocations - allocations
+
+
+def test_stereo_compute_frame_does_not_allocate():
+    from camera_control import DualCameraCapture
+    from stereo_vision import StereoVision
+
+    cam_capture = DualCameraCapture(left_cam_id=0, right_cam_id=1, preview_size=STEREO_SIZE)
+    vision = StereoVision(cam_capture, calibration=_calibration(), max_disp=64)
+    growth, peak, allocations = _growth(vision.compute_frame, vision.pool)
+
+    assert allocations == 0
+    assert growth < 16 * 1024
+    # Aucune carte flottante n'est allouée, même temporairement (seuls les tampons d'itération de NumPy, de
+    # taille fixe, apparaissent dans le pic)
+    assert peak < STEREO_SIZE[0] * STEREO_SIZE[1] * 4
+
+
+def test_tof_read_frame_does_not_allocate():
+    from tof_sensor import TofCamera
+
+    camera = TofCamera(max_distance=4)
+    camera.open_camera()
+    growth, peak, allocations = _growth(camera.read_frame, camera.pool)
+
+    assert allocations == 0
+    assert growth < 16 * 1024
+    assert peak < TOF_SHAPE[0] * TOF_SHAPE[1] * 4